@@ -1,24 +1,76 @@
 import os
 os.environ["GRADIO_TEMP_DIR"] = "./tmp"
+os.environ.setdefault("YOLO_WEIGHTS_MMAP", "true")  # shard workers share the weights' page cache
 
 import sys
+import time
 import torch
-import torchvision
-import gradio as gr
 import numpy as np
 from PIL import Image
-from huggingface_hub import snapshot_download
 from visualization import visualize_bbox
 from pdf_processor import process_pdf_pages, save_results
-import PyPDF2
-import io
-import tempfile
+from rasterizer import get_rasterizer
+from text_layer import TextLayer
+from pipeline import run_pipeline
+from result_cache import ResultCache, file_checksum, make_key
+from visualization_store import VisualizationStore, spill_directory
+from cascade import CascadePolicy, CascadeStats
+from model_registry import ModelRegistry
+from tracing import METRICS, DocumentTrace, TraceLog, annotate, record_predict_batch, serve_metrics, span
 import json
+import shutil
+import hashlib
 
-# == download weights ==
-model_dir = snapshot_download('juliozhao/DocLayout-YOLO-DocStructBench', local_dir='./models/DocLayout-YOLO-DocStructBench')
+# == weights from the local model store, downloaded on first use unless HF_HUB_OFFLINE=1 ==
+MODEL_NAME = 'DocLayout-YOLO-DocStructBench'
+MODEL_REPO = 'juliozhao/DocLayout-YOLO-DocStructBench'
+MODEL_FILE = 'doclayout_yolo_docstructbench_imgsz1024.pt'
+MODEL_SHA256 = os.environ.get("PDF_MODEL_SHA256")  # pin the weights checksum on first registration
+model_registry = ModelRegistry(os.environ.get("PDF_MODEL_STORE", os.path.join(os.path.dirname(__file__), "models")))
 # == select device ==
 device = 'cuda' if torch.cuda.is_available() else 'cpu'
+# == layout model runtime: 'auto' (fastest installed on CPU), 'openvino', 'onnx' or 'torch' ==
+LAYOUT_RUNTIME = os.environ.get("PDF_LAYOUT_RUNTIME", "auto")
+# == page rasterizer: 'auto', 'pymupdf' or 'pdf2image' ==
+RASTER_BACKEND = os.environ.get("PDF_RASTER_BACKEND", "auto")
+RASTER_WORKERS = int(os.environ.get("PDF_RASTER_WORKERS", 1))
+# == read born-digital regions from the PDF text layer, OCR only the rest ==
+USE_TEXT_LAYER = os.environ.get("PDF_USE_TEXT_LAYER", "1") != "0"
+# == detect at the model input size, re-render only OCR regions at OCR_DPI ==
+DETECT_IMGSZ = 1024
+OCR_DPI = 300
+# == two-pass rendering, PDF_TWO_PASS_RENDER=0 keeps a full OCR_DPI raster of every page instead ==
+TWO_PASS_RENDER = os.environ.get("PDF_TWO_PASS_RENDER", "1") != "0"
+# == letterbox pages to rectangles instead of DETECT_IMGSZ squares, RECT_STEP buckets for traced/exported models ==
+RECT_INFERENCE = os.environ.get("PDF_RECT_INFERENCE", "1") != "0"
+RECT_STEP = 128
+# == run the PyTorch model as TorchScript traces, one per page shape bucket, kept across restarts ==
+COMPILE_MODEL = os.environ.get("PDF_COMPILE_MODEL", "0") != "0"
+COMPILE_CACHE_DIR = os.environ.get("PDF_COMPILE_CACHE_DIR", "./cache/traces")
+# == bfloat16 autocast + channels_last for the PyTorch model, on CPUs with native bf16 (AVX512-BF16/AMX) ==
+BF16_INFERENCE = os.environ.get("PDF_BF16_INFERENCE", "0") != "0"
+# == pages per batched detector forward pass ==
+DETECT_BATCH_SIZE = int(os.environ.get("PDF_DETECT_BATCH_SIZE", 4))
+# == streaming pipeline: text extraction threads and queue depth between stages ==
+OCR_WORKERS = int(os.environ.get("PDF_OCR_WORKERS", 1))
+PIPELINE_QUEUE_SIZE = 2
+# == content-addressed cache of processed documents, set PDF_RESULT_CACHE_DIR="" to disable ==
+RESULT_CACHE_DIR = os.environ.get("PDF_RESULT_CACHE_DIR", "./cache/results")
+RESULT_CACHE_MAX_MB = int(os.environ.get("PDF_RESULT_CACHE_MAX_MB", 2048))
+result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_MB << 20) if RESULT_CACHE_DIR else None
+# == memory-bounded mode for very long PDFs, 0 keeps every visualization in memory at full size ==
+MEMORY_BUDGET_MB = int(os.environ.get("PDF_MEMORY_BUDGET_MB", 0))
+BOUNDED_VIS_MAX_SIDE = 1024
+# == coarse-to-fine detection: a low-resolution pass first, full resolution only for pages the policy escalates ==
+CASCADE = os.environ.get("PDF_CASCADE", "0") != "0"
+CASCADE_POLICY = CascadePolicy.from_json(os.environ.get("PDF_CASCADE_POLICY", ""))  # JSON overrides of the defaults
+cascade_stats = CascadeStats(metrics=METRICS)
+# == per-document traces and span histograms, served on PDF_METRICS_PORT (0 to disable) ==
+trace_log = TraceLog(os.environ.get("PDF_TRACE_LOG") or None)  # JSONL file every document trace is appended to
+METRICS_HOST = os.environ.get("PDF_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("PDF_METRICS_PORT", 7861))
+# == split long PDFs into page shards over this many worker processes, 0 or 1 processes in-line ==
+SHARD_WORKERS = int(os.environ.get("PDF_SHARD_WORKERS", 0))
 
 id_to_names = {
     0: 'title', 
@@ -33,140 +85,378 @@ id_to_names = {
     9: 'formula_caption'
 }
 
-def process_pdf(pdf_path, conf_threshold, iou_threshold):
+
+class PDFProcessingError(Exception):
+    """A PDF produced no result at all, e.g. it is empty or none of its pages could be rendered."""
+
+
+def process_pdf(pdf_path, conf_threshold, iou_threshold, **kwargs):
+    """
+    Run the full PDF pipeline and return (visualizations, json_output) once every page is done.
+
+    With a memory budget, visualizations spilled into a caller-owned `spill_dir` are returned as paths into it.
+    Without one, they are spilled into a directory of this call and read back as (downscaled) arrays before it is
+    deleted, so the result stays valid after the call and in other processes, e.g. of a ShardPool worker.
+    """
+    spill_dir = None
+    if kwargs.get('memory_budget_mb', MEMORY_BUDGET_MB) and kwargs.get('spill_dir') is None:
+        spill_dir = kwargs['spill_dir'] = spill_directory()
+    try:
+        visualizations, json_output = [], None
+        for visualizations, json_output in process_pdf_stream(pdf_path, conf_threshold, iou_threshold, **kwargs):
+            pass
+        if spill_dir is not None:
+            visualizations = [np.asarray(Image.open(v).convert("RGB"))
+                              if isinstance(v, str) and v.startswith(spill_dir) else v for v in visualizations]
+        return visualizations, json_output
+    finally:
+        if spill_dir is not None:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def check_pdf_path(pdf_path):
+    """Check that a path points to an existing PDF file, printing why not if it doesn't."""
     print(f"DEBUG: Received PDF path: {pdf_path}")
     print(f"DEBUG: File exists check: {os.path.exists(pdf_path) if pdf_path else False}")
-    
+
     if not pdf_path:
         print("Error: PDF path is None or empty")
-        return [], None
+        return False
     if not os.path.exists(pdf_path):
         print(f"Error: PDF file does not exist at path: {pdf_path}")
-        return [], None
+        return False
     if not pdf_path.lower().endswith('.pdf'):
         print(f"Error: File is not a PDF: {pdf_path}")
-        return [], None
+        return False
+    return True
+
+
+def process_pdf_sharded(pdf_path, conf_threshold, iou_threshold, pool, shard_size=None, use_cache=True, **kwargs):
+    """
+    Process a PDF split into page shards over a ShardPool and yield (visualizations, json_output) as shards finish.
+
+    Shards are merged in page order, so the output matches process_pdf_stream(). Keyword arguments are passed on to
+    process_pdf_stream() in the workers, whose spans are merged into one trace of the document. With a memory budget,
+    the workers spill visualizations into a directory of this generator, deleted when it finishes.
+    """
+    if not check_pdf_path(pdf_path):
+        yield [], None
+        return
+
+    cascade = kwargs.setdefault('cascade', CASCADE_POLICY if CASCADE else None)
+    spill_dir = None
+    if kwargs.get('memory_budget_mb', MEMORY_BUDGET_MB) and kwargs.get('spill_dir') is None:
+        spill_dir = kwargs['spill_dir'] = spill_directory()
+    try:
+        cache_key = None
+        if use_cache and result_cache is not None:
+            settings = cache_settings(conf_threshold, iou_threshold, kwargs.get('use_text_layer', USE_TEXT_LAYER),
+                                      kwargs.get('two_pass_render', TWO_PASS_RENDER), cascade)
+            cache_key = document_cache_key(pdf_path, settings)
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                json_output, visualizations = cached
+                yield visualizations, json_output
+                return
+
+        trace = DocumentTrace(pdf_path)
+        parse_start = time.perf_counter()
+        with get_rasterizer(pdf_path, backend=kwargs.get('raster_backend', RASTER_BACKEND)) as rasterizer:
+            total_pages = rasterizer.page_count
+        trace.record("pdf_parse", time.perf_counter() - parse_start, pages=total_pages)
+        if total_pages == 0:
+            print("Error: PDF file is empty")
+            yield [], None
+            return
+
+        shards = pool.shards(total_pages, shard_size)
+        print(f"DEBUG: Processing {total_pages} pages in {len(shards)} shards over {pool.workers} workers")
+        visualizations = []
+        json_output = {
+            'document_layout': {'total_pages': total_pages, 'pages': []},
+            'text_content': {'total_pages': total_pages, 'pages': []}
+        }
+        for shard_visualizations, shard_output, shard_spans in pool.map(pdf_path, conf_threshold, iou_threshold, shards,
+                                                                        use_cache=use_cache, **kwargs):
+            trace.extend(shard_spans)
+            if shard_output is None:
+                continue
+            visualizations.extend(shard_visualizations)
+            json_output['document_layout']['pages'].extend(shard_output['document_layout']['pages'])
+            json_output['text_content']['pages'].extend(shard_output['text_content']['pages'])
+            yield visualizations, json_output
 
+        if cascade is not None:
+            # Workers count their own pages, so the escalations are recorded again from the merged document
+            reasons = [page.get('escalation') for page in json_output['document_layout']['pages']]
+            cascade_stats.record(reasons)
+            escalated = sum(reason is not None for reason in reasons)
+            print(f"DEBUG: Cascade escalated {escalated}/{len(json_output['document_layout']['pages'])} pages, "
+                  f"{cascade_stats.summary()['escalated_share']:.1%} of all pages so far")
+        finish_trace(trace, len(json_output['document_layout']['pages']))
+        if not json_output['document_layout']['pages']:
+            yield visualizations, None
+        elif cache_key is not None and len(json_output['document_layout']['pages']) == total_pages:
+            result_cache.put(cache_key, json_output, visualizations)
+    except Exception as e:
+        print(f"Error processing PDF: {str(e)}")
+        yield [], None
+    finally:
+        if spill_dir is not None:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def process_pdf_stream(pdf_path, conf_threshold, iou_threshold, raster_backend=RASTER_BACKEND,
+                       raster_workers=RASTER_WORKERS, use_text_layer=USE_TEXT_LAYER, two_pass_render=TWO_PASS_RENDER,
+                       ocr_workers=OCR_WORKERS, queue_size=PIPELINE_QUEUE_SIZE, use_cache=True, pages=None,
+                       memory_budget_mb=MEMORY_BUDGET_MB, detect_batch_size=DETECT_BATCH_SIZE,
+                       cascade=CASCADE_POLICY if CASCADE else None, trace=None, spill_dir=None, raise_errors=False):
+    """
+    Process a PDF and yield (visualizations, json_output) every time another page is finished.
+
+    Rasterization, layout detection and text extraction run as overlapping pipeline stages, so the first page is
+    returned while later pages are still being rendered and detected. `pages` restricts processing to a list of
+    0-based page indices, e.g. one shard of a document; `total_pages` still reports the whole document.
+
+    With `memory_budget_mb` set, at most a few pages are rasterized at a time and visualizations are downscaled and
+    spilled to JPEG files once the budget is used up, so memory use does not grow with the page count. Spilled files
+    are deleted when the generator finishes unless they go to a caller-owned `spill_dir`, so pass one when the
+    visualizations are used after iterating, as process_pdf() does.
+
+    With a `cascade` policy, pages are detected at low resolution first and only escalated pages are detected again
+    at DETECT_IMGSZ; each layout page then records its 'escalation' reason, None if the coarse pass sufficed.
+
+    Every stage, page, element and OCR call is timed as a span of a DocumentTrace, which is added to `trace_log` when
+    the document is done. A `trace` passed in, e.g. by a shard worker, collects the spans for the caller instead.
+
+    Errors are printed and end the stream with a None result, unless `raise_errors` is set: then a document that
+    cannot be processed raises its exception, or a PDFProcessingError saying why it has no result.
+    """
+    if not check_pdf_path(pdf_path):
+        if raise_errors:
+            raise PDFProcessingError(f"{pdf_path} is not a readable PDF file")
+        yield [], None
+        return
+
+    own_trace = trace is None
+    if own_trace:
+        trace = DocumentTrace(pdf_path)
     visualizations = []
-    pdf_images = []
-    model_outputs = {'bboxes': [], 'classes': [], 'scores': []}
-    
+    store = None
+    if memory_budget_mb:
+        store = VisualizationStore(memory_budget_mb << 20, max_side=BOUNDED_VIS_MAX_SIDE, spill_dir=spill_dir)
+        queue_size = 1
+    reserved = {}  # raster bytes counted against the memory budget per page, until the page is consumed
+
     try:
+        cache_key = settings = None
+        if use_cache and result_cache is not None:
+            settings = cache_settings(conf_threshold, iou_threshold, use_text_layer, two_pass_render, cascade)
+            if pages is None:  # partial runs only use the page cache
+                cache_key = document_cache_key(pdf_path, settings)
+                cached = result_cache.get(cache_key)
+                if cached is not None:
+                    json_output, visualizations = cached
+                    yield visualizations, json_output
+                    return
+
         print(f"DEBUG: Opening PDF file: {pdf_path}")
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            print(f"DEBUG: PDF loaded successfully. Number of pages: {len(pdf_reader.pages)}")
+        # Two-pass rendering: detect on a raster at the detector's input size and re-render only OCR regions at OCR_DPI
+        max_side = DETECT_IMGSZ if two_pass_render else None
+        parse_start = time.perf_counter()
+        with get_rasterizer(pdf_path, backend=raster_backend, dpi=OCR_DPI, workers=raster_workers,
+                            max_side=max_side) as rasterizer:
+            total_pages = rasterizer.page_count
+            trace.record("pdf_parse", time.perf_counter() - parse_start, pages=total_pages)
+            print(f"DEBUG: PDF loaded successfully. Number of pages: {total_pages}")
+            if store is not None and hasattr(rasterizer, 'chunk_size'):
+                rasterizer.chunk_size = 1  # pdf2image: one page per poppler call instead of a batch of rasters
             
-            if len(pdf_reader.pages) == 0:
+            if total_pages == 0:
                 print("Error: PDF file is empty")
-                return [], None
+                if raise_errors:
+                    raise PDFProcessingError("PDF file is empty")
+                yield [], None
+                return
 
-            # Initialize JSON structure for layout
+            # Initialize JSON structure for layout and text
             json_output = {
                 'document_layout': {
-                    'total_pages': len(pdf_reader.pages),
+                    'total_pages': total_pages,
+                    'pages': []
+                },
+                'text_content': {
+                    'total_pages': total_pages,
                     'pages': []
                 }
             }
 
-            # Store page images for text extraction
-            page_images = []
-            
-            for page_num in range(len(pdf_reader.pages)):
+            from text_extraction import get_page_text
+            text_layer = None
+            if use_text_layer:
+                parse_start = time.perf_counter()
                 try:
+                    text_layer = TextLayer(pdf_path)
+                    trace.record("pdf_parse", time.perf_counter() - parse_start, source="text_layer")
+                except ImportError:
+                    print("DEBUG: PyMuPDF not installed, running OCR on every region")
+
+            def rendered_pages():
+                # Time the pipeline waits for each page; renderers working ahead hide part of the rendering time
+                start = time.perf_counter()
+                for page_num, page_image in rasterizer.iter_pages(pages):
+                    trace.record("rasterize", time.perf_counter() - start, page=page_num + 1)
+                    if store is not None and page_image is not None:
+                        reserved[page_num] = page_image.width * page_image.height * 3
+                        store.reserve(reserved[page_num])
+                    yield page_num, page_image
+                    start = time.perf_counter()
+
+            def detect(batch):
+                # Pages that need the detector are collected and run through it in one batched call
+                results, todo = [None] * len(batch), []
+                for i, (page_num, page_image) in enumerate(batch):
                     print(f"\nDEBUG: Processing page {page_num + 1}")
-                    page = pdf_reader.pages[page_num]
-                    
-                    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-                        try:
-                            from pdf2image import convert_from_bytes
-                            print(f"DEBUG: Converting page {page_num + 1} to image")
-                            try:
-                                # Extract page content as bytes
-                                page_content = io.BytesIO()
-                                writer = PyPDF2.PdfWriter()
-                                writer.add_page(page)
-                                writer.write(page_content)
-                                page_content.seek(0)
-                                
-                                # Convert PDF bytes to image
-                                images = convert_from_bytes(
-                                    page_content.getvalue(),
-                                    dpi=300,
-                                    thread_count=2,
-                                    grayscale=False,
-                                    size=(None, None),
-                                    use_pdftocairo=True
-                                )
-                                if not images:
-                                    print(f"Warning: Could not convert page {page_num + 1} to image")
-                                    continue
-                                print(f"DEBUG: Page {page_num + 1} converted successfully")
-                            except Exception as conv_error:
-                                print(f"Error converting page {page_num + 1} to image: {str(conv_error)}")
-                                continue
-
-                            page_image = images[0]
-                            # Store the page image for later use
-                            page_images.append(page_image)
-                            
-                            page_image.save(tmp_file.name)
-                            print(f"DEBUG: Saved page {page_num + 1} as temporary image")
-                            
-                            img = np.array(page_image)
-                            processed_result = recognize_image(img, conf_threshold, iou_threshold)
-                            if processed_result is not None:
-                                visualizations.append(processed_result['visualization'])
-                                pdf_images.append(tmp_file.name)
-                                model_outputs['bboxes'].append(processed_result['bboxes'])
-                                model_outputs['classes'].append(processed_result['classes'])
-                                model_outputs['scores'].append(processed_result['scores'])
-                                print(f"DEBUG: Successfully processed page {page_num + 1}")
-
-                                # Add page layout information
-                                page_elements = []
-                                for bbox, cls, score in zip(processed_result['bboxes'], 
-                                                          processed_result['classes'], 
-                                                          processed_result['scores']):
-                                    element = {
-                                        'type': id_to_names[int(cls)],
-                                        'confidence': float(score),
-                                        'bbox': {
-                                            'x1': float(bbox[0]),
-                                            'y1': float(bbox[1]),
-                                            'x2': float(bbox[2]),
-                                            'y2': float(bbox[3])
-                                        }
-                                    }
-                                    page_elements.append(element)
-
-                                json_output['document_layout']['pages'].append({
-                                    'page_number': page_num + 1,
-                                    'elements': page_elements
-                                })
-
-                        except Exception as page_error:
-                            print(f"Error processing page {page_num + 1}: {str(page_error)}")
+                    if page_image is None:
+                        print(f"Warning: Could not convert page {page_num + 1} to image")
+                        continue
+                    print(f"DEBUG: Page {page_num + 1} converted successfully")
+
+                    # Unchanged pages of a revised document are served from the page cache
+                    page_key = None
+                    if settings is not None:
+                        page_key = page_cache_key(page_image, page_num, text_layer, settings)
+                        cached_page = result_cache.get(page_key)
+                        if cached_page is not None:
+                            page_result, (visualization,) = cached_page
+                            page_result['layout']['page_number'] = page_result['text']['page_number'] = page_num + 1
+                            print(f"DEBUG: Reusing cached results for page {page_num + 1}")
+                            results[i] = page_num, visualization, page_result['layout'], None, page_result['text'], None
                             continue
-                        finally:
-                            if os.path.exists(tmp_file.name):
-                                os.unlink(tmp_file.name)
-                except Exception as page_error:
-                    print(f"Error processing page {page_num + 1}: {str(page_error)}")
-                    continue
-
-        # Extract text using the layout information
-        if pdf_images and model_outputs['bboxes']:
-            from text_extraction import get_text
-            json_text_output = get_text(json_output, page_images)
-            json_output['text_content'] = json_text_output
-        else:
-            json_output = None
+                    todo.append((i, page_num, page_image, page_key))
 
-        return visualizations, json_output
+                if not todo:
+                    return results
+                annotate(pages=[page_num + 1 for _, page_num, _, _ in todo])  # the detector spans of this batch
+                imgs = [np.array(page_image) for _, _, page_image, _ in todo]
+                if store is not None:
+                    store.reserve(2 * sum(img.nbytes for img in imgs))  # the arrays and the detector's letterboxed copy
+                processed_results = recognize_images(imgs, conf_threshold, iou_threshold, batch_size=detect_batch_size,
+                                                     cascade=cascade)
+                if store is not None:
+                    store.release(2 * sum(img.nbytes for img in imgs))
+                del imgs
+
+                for (i, page_num, page_image, page_key), processed_result in zip(todo, processed_results):
+                    if two_pass_render:
+                        # Boxes are reported on the OCR_DPI canvas that OCR crops are rendered from
+                        ocr_page = rasterizer.lazy_page(page_num, OCR_DPI)
+                        scale_x = ocr_page.size[0] / page_image.width
+                        scale_y = ocr_page.size[1] / page_image.height
+                    else:
+                        ocr_page, scale_x, scale_y = page_image, 1.0, 1.0
+
+                    # Add page layout information, scaled in one array op and converted to floats by tolist()
+                    bboxes = (processed_result['bboxes'] * np.array([scale_x, scale_y, scale_x, scale_y])).tolist()
+                    page_elements = [
+                        {
+                            'type': id_to_names[cls],
+                            'confidence': score,
+                            'bbox': {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
+                        }
+                        for (x1, y1, x2, y2), cls, score in zip(bboxes,
+                                                               processed_result['classes'].tolist(),
+                                                               processed_result['scores'].tolist())
+                    ]
+                    print(f"DEBUG: Successfully processed page {page_num + 1}")
+
+                    layout_page = {
+                        'page_number': page_num + 1,
+                        'elements': page_elements
+                    }
+                    if cascade is not None:
+                        layout_page['escalation'] = processed_result['escalation']
+                    results[i] = page_num, processed_result['visualization'], layout_page, ocr_page, None, page_key
+                return results
+
+            def extract(detected):
+                page_num, visualization, layout_page, ocr_page, page_text, page_key = detected
+                if page_text is None:
+                    with span("extract", page=page_num + 1):
+                        page_text = get_page_text(layout_page, ocr_page, page_num, text_layer=text_layer)
+                    if page_key is not None:
+                        result_cache.put(page_key, {'layout': layout_page, 'text': page_text}, [visualization])
+                return visualization, layout_page, page_text
+
+            # One detector thread, the model is not re-entrant; it batches whatever pages are already rendered
+            stages = [(trace.bind(detect), 1, detect_batch_size), (trace.bind(extract), ocr_workers)]
+            try:
+                for visualization, layout_page, page_text in run_pipeline(rendered_pages(), stages, queue_size):
+                    if store is not None:
+                        store.release(reserved.pop(layout_page['page_number'] - 1, 0))  # its raster is released
+                        visualization = store.add(visualization)
+                    visualizations.append(visualization)
+                    json_output['document_layout']['pages'].append(layout_page)
+                    json_output['text_content']['pages'].append(page_text)
+                    yield visualizations, json_output
+            finally:
+                if text_layer is not None:
+                    text_layer.close()
+
+        if own_trace:
+            finish_trace(trace, len(json_output['document_layout']['pages']))
+        if not json_output['document_layout']['pages']:
+            if raise_errors:
+                raise PDFProcessingError("no page could be rendered")
+            yield visualizations, None
+        elif cache_key is not None and len(json_output['document_layout']['pages']) == total_pages:
+            result_cache.put(cache_key, json_output, visualizations)
     except Exception as e:
         print(f"Error processing PDF: {str(e)}")
-        return [], None
+        if raise_errors:
+            raise
+        yield [], None
+    finally:
+        if store is not None:
+            store.close()  # every result has been consumed, spilled files the store owns are no longer read
+
+
+def finish_trace(trace, pages):
+    """Record the whole document as a span, keep its trace in `trace_log` and print where the time went."""
+    trace.record("document", time.time() - trace.started, start=trace.started, pages=pages)
+    trace_log.add(trace)
+    stages = [f"{name} {entry['total_ms'] / 1000:.2f}s" for name, entry in trace.summary().items()
+              if name != "document"]
+    print(f"DEBUG: Trace {trace.trace_id} of {pages} pages: {', '.join(stages[:6])}")
+
+
+def cache_settings(conf_threshold, iou_threshold, use_text_layer, two_pass_render, cascade=None):
+    """Everything besides the input that changes the output: thresholds, model weights, OCR engines and options."""
+    from text_extraction import ocr_engine_versions
+    return [
+        float(conf_threshold),
+        float(iou_threshold),
+        model_registry.checksum(MODEL_NAME),
+        ocr_engine_versions(),
+        {'text_layer': use_text_layer, 'two_pass_render': two_pass_render, 'detect_imgsz': DETECT_IMGSZ, 'ocr_dpi': OCR_DPI,
+         'runtime': LAYOUT_RUNTIME, 'rect_step': RECT_STEP if RECT_INFERENCE else None, 'bf16': BF16_INFERENCE,
+         'cascade': cascade.settings() if cascade is not None else None},
+    ]
+
+
+def document_cache_key(pdf_path, settings):
+    """Cache key of a whole document: the PDF bytes plus the cache settings."""
+    return make_key('document', file_checksum(pdf_path, memoize=False), settings)
+
+
+def page_cache_key(page_image, page_num, text_layer, settings):
+    """Cache key of one page: its rendered pixels, its text layer words and the cache settings."""
+    digest = hashlib.sha256(page_image.tobytes())
+    digest.update(repr(page_image.size).encode())
+    if text_layer is not None:
+        digest.update(json.dumps(text_layer.words(page_num)).encode())
+    # Title detection in text extraction treats the first page specially
+    return make_key('page', digest.hexdigest(), page_num == 0, settings)
 
 
 def recognize_image(input_img, conf_threshold, iou_threshold):
@@ -174,29 +464,63 @@ def recognize_image(input_img, conf_threshold, iou_threshold):
     print(f"Input image shape: {input_img.shape if hasattr(input_img, 'shape') else 'Not a numpy array'}")
     print(f"Confidence threshold: {conf_threshold}, IOU threshold: {iou_threshold}")
     
-    det_res = model.predict(
-        input_img,
-        imgsz=1024,
-        conf=conf_threshold,
-        device=device,
-    )[0]
+    return recognize_images([input_img], conf_threshold, iou_threshold)[0]
+
+
+def recognize_images(input_imgs, conf_threshold, iou_threshold, batch_size=DETECT_BATCH_SIZE, cascade=None):
+    """
+    Detect the layout of several page images with batched forward passes.
+
+    Consecutive images of the same shape are letterboxed together and sent through the model `batch_size` at a
+    time. With RECT_INFERENCE, pages are padded to the smallest stride-aligned rectangle rather than a square, or to
+    the nearest RECT_STEP-aligned one for traced or exported models.
+    Returns one result dict per image, as recognize_image() does.
+
+    With a CascadePolicy, all pages first go through a cheap pass at `cascade.coarse_imgsz`, and only the pages it
+    escalates are detected again at DETECT_IMGSZ. Each result then has an 'escalation' reason, None for pages whose
+    coarse detections were kept.
+    """
+    # Compact results: confidence filter, class-agnostic duplicate removal and rescaling happen in the predictor
+    kwargs = dict(device=device, batch=batch_size, rect=RECT_INFERENCE, rect_step=RECT_STEP, compile=COMPILE_MODEL,
+                  compile_dir=COMPILE_CACHE_DIR, bf16=BF16_INFERENCE, compact=True, dedup_iou=iou_threshold,
+                  agnostic_nms=True)
+    if cascade is None:
+        with span("detect", imgsz=DETECT_IMGSZ, batch=len(input_imgs)):
+            det_results = model.predict(input_imgs, imgsz=DETECT_IMGSZ, conf=conf_threshold, **kwargs)
+        return [postprocess_detection(img, det_res) for img, det_res in zip(input_imgs, det_results)]
+
+    with span("detect", imgsz=cascade.coarse_imgsz, batch=len(input_imgs), cascade="coarse"):
+        coarse = model.predict(input_imgs, imgsz=cascade.coarse_imgsz, conf=min(cascade.floor_conf, conf_threshold),
+                               **kwargs)
+    reasons = [cascade.escalate(det, img.shape[:2], conf_threshold) for img, det in zip(input_imgs, coarse)]
+    cascade_stats.record(reasons)
+    det_results = [det[det['conf'] > conf_threshold] for det in coarse]
+    escalated = [i for i, reason in enumerate(reasons) if reason is not None]
+    if escalated:
+        with span("detect", imgsz=DETECT_IMGSZ, batch=len(escalated), cascade="fine"):
+            fine = model.predict([input_imgs[i] for i in escalated], imgsz=DETECT_IMGSZ, conf=conf_threshold, **kwargs)
+        for i, det in zip(escalated, fine):
+            det_results[i] = det
+    print(f"DEBUG: Cascade escalated {len(escalated)}/{len(input_imgs)} pages: {[r for r in reasons if r]}")
+
+    results = []
+    for img, det_res, reason in zip(input_imgs, det_results, reasons):
+        result = postprocess_detection(img, det_res)
+        result['escalation'] = reason
+        results.append(result)
+    return results
+
+
+def postprocess_detection(input_img, det_res):
+    """Draw one image's compact detections and attach them as arrays."""
     print("\nDetection results:")
     print(f"Number of detections: {len(det_res)}")
-    
-    boxes = det_res.__dict__['boxes'].xyxy
-    classes = det_res.__dict__['boxes'].cls
-    scores = det_res.__dict__['boxes'].conf
-    
-    indices = torchvision.ops.nms(boxes=torch.Tensor(boxes), scores=torch.Tensor(scores),iou_threshold=iou_threshold)
-    boxes, scores, classes = boxes[indices], scores[indices], classes[indices]
 
-    if len(boxes.shape) == 1:
-        boxes = np.expand_dims(boxes, 0)
-        scores = np.expand_dims(scores, 0)
-        classes = np.expand_dims(classes, 0)
+    boxes, classes, scores = det_res['xyxy'], det_res['cls'], det_res['conf']
 
     # Create visualization
-    vis_result = visualize_bbox(input_img, boxes, classes, scores, id_to_names)
+    with span("visualize"):
+        vis_result = visualize_bbox(input_img, boxes, classes, scores, id_to_names)
     
     # Add detection results to the output
     vis_result['bboxes'] = boxes
@@ -205,16 +529,46 @@ def recognize_image(input_img, conf_threshold, iou_threshold):
     
     return vis_result
 
+def load_model():
+    """Load the layout model, exported to the fastest CPU runtime on first use when running on CPU."""
+    # Verified FP32 weights, memory-mapped so every process shares one copy
+    weights = model_registry.inference_weights(MODEL_NAME, repo=MODEL_REPO, filename=MODEL_FILE, sha256=MODEL_SHA256)
+    if device != 'cpu':
+        from doclayout_yolo import YOLOv10
+        layout_model = YOLOv10(weights)
+    else:
+        from model_runtime import load_layout_model
+        example_root = os.path.join(os.path.dirname(__file__), "assets", "example")
+        parity_images = [os.path.join(example_root, _) for _ in sorted(os.listdir(example_root)) if _.endswith("jpg")]
+        layout_model, runtime = load_layout_model(weights, runtime=LAYOUT_RUNTIME, imgsz=DETECT_IMGSZ,
+                                                  parity_images=parity_images,
+                                                  checksum=model_registry.checksum(MODEL_NAME))
+        print(f"Using {runtime} runtime for layout detection")
+    # Preprocess, inference and postprocess time of every detector batch, as spans of the document being processed
+    layout_model.add_callback("on_predict_batch_end", record_predict_batch)
+    return layout_model
+
 def gradio_reset():
     return gr.update(value=None), gr.update(value=None)
 
     
 if __name__ == "__main__":
+    import gradio as gr
+
     root_path = os.path.abspath(os.getcwd())
     # == load model ==
-    from doclayout_yolo import YOLOv10
     print(f"Using device: {device}")
-    model = YOLOv10(os.path.join(os.path.dirname(__file__), "models", "DocLayout-YOLO-DocStructBench", "doclayout_yolo_docstructbench_imgsz1024.pt"))  # load an official model
+    model = load_model()
+    if METRICS_PORT:
+        serve_metrics(trace_log, host=METRICS_HOST, port=METRICS_PORT)
+
+    predict_pdf_fn = process_pdf_stream
+    if SHARD_WORKERS > 1:
+        from shard_pool import ShardPool
+        shard_pool = ShardPool(SHARD_WORKERS)
+
+        def predict_pdf_fn(pdf_path, conf_threshold, iou_threshold):
+            yield from process_pdf_sharded(pdf_path, conf_threshold, iou_threshold, shard_pool)
     
     with open("header.html", "r") as file:
         header = file.read()
@@ -278,6 +632,8 @@ if __name__ == "__main__":
         clear_img.click(gradio_reset, inputs=None, outputs=[input_img, output_gallery, output_json])
         clear_pdf.click(gradio_reset, inputs=None, outputs=[input_pdf, output_gallery, output_json])
         predict_img.click(recognize_image, inputs=[input_img,conf_threshold,iou_threshold], outputs=[output_gallery])
-        predict_pdf.click(process_pdf, inputs=[input_pdf,conf_threshold,iou_threshold], outputs=[output_gallery, output_json])
+        predict_pdf.click(predict_pdf_fn, inputs=[input_pdf,conf_threshold,iou_threshold], outputs=[output_gallery, output_json])
     
-    demo.launch(server_name="0.0.0.0", server_port=7860, debug=True, share=True)
\ No newline at end of file
+    # Cached visualizations are served straight from the result cache
+    demo.launch(server_name="0.0.0.0", server_port=7860, debug=True, share=True,
+                allowed_paths=[RESULT_CACHE_DIR] if RESULT_CACHE_DIR else None)
\ No newline at end of file
@@ -0,0 +1,208 @@
+import os
+import glob
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from cascade import CascadePolicy
+from result_cache import file_checksum
+from shard_pool import ShardPool
+from tracing import METRICS, DocumentTrace, TraceLog
+
+
+def expand_inputs(patterns, extensions=(".pdf",)):
+    """
+    Resolve input globs and directories into a sorted, de-duplicated list of file paths.
+
+    Directories are searched recursively. Only files whose name ends in one of `extensions` (lowercase) are kept,
+    e.g. (".pdf", ".jpg", ".jpeg", ".png") for tools that also take page images.
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*")
+        for path in glob.glob(pattern, recursive=True):
+            if os.path.isfile(path) and path.lower().endswith(tuple(extensions)):
+                paths.add(os.path.abspath(path))
+    return sorted(paths)
+
+
+def load_manifest(manifest_path):
+    """
+    Read the checkpoint manifest of an earlier run.
+
+    The manifest is an append-only JSONL file with one line per finished document, so a run that crashed leaves at
+    worst a truncated last line, which is ignored.
+
+    Returns:
+        dict: path -> last manifest record of that document.
+    """
+    records = {}
+    if not os.path.exists(manifest_path):
+        return records
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record["path"]] = record
+    return records
+
+
+def output_records(path, checksum, json_output, per_page):
+    """Turn a processed document into JSONL records, one per document or one per page."""
+    if not per_page:
+        return [{"path": path, "checksum": checksum, **json_output}]
+    return [
+        {"path": path, "checksum": checksum, "page_number": layout["page_number"], "layout": layout, "text": text}
+        for layout, text in zip(json_output["document_layout"]["pages"], json_output["text_content"]["pages"])
+    ]
+
+
+def append_line(f, record):
+    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Run layout detection and text extraction over many PDFs.")
+    parser.add_argument('inputs', nargs='+', type=str, help="PDF files, directories or glob patterns")
+    parser.add_argument('--output', default='outputs/batch.jsonl', required=False, type=str)
+    parser.add_argument('--manifest', default=None, required=False, type=str,
+                        help="checkpoint manifest, defaults to <output>.manifest.jsonl")
+    parser.add_argument('--records', default='document', choices=['document', 'page'], required=False, type=str)
+    parser.add_argument('--workers', default=1, required=False, type=int)
+    parser.add_argument('--torch-threads', default=None, required=False, type=int)
+    parser.add_argument('--conf', default=0.25, required=False, type=float)
+    parser.add_argument('--iou', default=0.45, required=False, type=float)
+    parser.add_argument('--retry-failed', action='store_true', help="process documents that failed in earlier runs")
+    parser.add_argument('--cascade', action='store_true',
+                        help="detect at low resolution first, full resolution only for pages the policy escalates")
+    parser.add_argument('--cascade-policy', default='', required=False, type=str,
+                        help='JSON overrides of the cascade policy, e.g. \'{"coarse_imgsz": 512}\'')
+    parser.add_argument('--cache', action='store_true',
+                        help="look documents and pages up in the app's result cache and store them there; off by "
+                             "default, a batch rarely sees a document twice and every page would be written to disk")
+    parser.add_argument('--traces', default=None, required=False, type=str,
+                        help="JSONL file to append the trace of every document to, with a span per stage and OCR call")
+    args = parser.parse_args()
+
+    manifest_path = args.manifest or f"{args.output}.manifest.jsonl"
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+
+    pdf_paths = expand_inputs(args.inputs)
+    manifest = load_manifest(manifest_path)
+
+    # A document is skipped only when it finished before with the same contents
+    todo = []
+    for path in pdf_paths:
+        record, checksum = manifest.get(path), file_checksum(path, memoize=False)
+        if record is not None and record["checksum"] == checksum:
+            if record["status"] == "done" or not args.retry_failed:
+                continue
+        todo.append((path, checksum))
+    print(f"Found {len(pdf_paths)} PDFs, {len(pdf_paths) - len(todo)} already processed, {len(todo)} to go")
+
+    cascade = CascadePolicy.from_json(args.cascade_policy) if args.cascade else None
+    trace_log = TraceLog(args.traces, keep=1) if args.traces else None
+    done = failed = pages = escalated = 0
+    start = time.time()
+    with ShardPool(args.workers, torch_threads=args.torch_threads) as pool, \
+            open(args.output, "a", encoding="utf-8") as out, open(manifest_path, "a", encoding="utf-8") as mf:
+        pending, queued = {}, deque(todo)
+        # Documents in flight when a worker process died. The dead worker breaks the pool for all of them, so they
+        # are rerun one at a time on fresh workers: a document that kills its worker even alone is the culprit.
+        suspects = deque()
+
+        def submit(path, checksum, alone=False):
+            """Queue a document on the pool, False if the pool is already broken."""
+            try:
+                future = pool.submit(path, args.conf, args.iou, keep_visualizations=False, use_cache=args.cache,
+                                     cascade=cascade, raise_errors=True)
+            except BrokenProcessPool:
+                return False
+            pending[future] = (path, checksum, time.time(), alone)
+            return True
+
+        broken = False
+        while True:
+            # A broken pool takes no work until the documents still in flight are collected, then it is replaced
+            if broken and not pending:
+                if suspects:
+                    print(f"Warning: a worker process died, rerunning {len(suspects)} document(s) one at a time")
+                pool.restart()
+                broken = False
+            if not broken and suspects:
+                if not pending:
+                    item = suspects.popleft()
+                    if not submit(*item, alone=True):
+                        suspects.appendleft(item)
+                        broken = True
+            elif not broken:
+                # Keep every worker busy with one document plus one queued behind it
+                while queued and len(pending) < 2 * pool.workers:
+                    item = queued.popleft()
+                    if not submit(*item):
+                        queued.appendleft(item)
+                        broken = True
+                        break
+            if not pending:
+                if broken:
+                    continue  # the workers are replaced at the top of the loop
+                break
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path, checksum, submitted, alone = pending.pop(future)
+                try:
+                    _, json_output, spans = future.result()
+                    error = None
+                    trace = DocumentTrace(path, started=submitted)
+                    trace.extend(spans)  # counts the worker's spans in METRICS
+                    if trace_log is not None:
+                        trace_log.add(trace)
+                except BrokenProcessPool:
+                    broken = True
+                    if not alone:
+                        suspects.append((path, checksum))  # no checkpoint record, it is rerun
+                        continue
+                    json_output, error = None, "worker process died processing this document"
+                except Exception as e:
+                    json_output, error = None, f"{type(e).__name__}: {e}"
+
+                if error is None:
+                    # Output first, then the checkpoint: a crash in between reprocesses the document on resume
+                    for record in output_records(path, checksum, json_output, args.records == 'page'):
+                        append_line(out, record)
+                    n_pages = len(json_output["document_layout"]["pages"])
+                    escalated += sum(p.get("escalation") is not None for p in json_output["document_layout"]["pages"])
+                    append_line(mf, {"path": path, "checksum": checksum, "status": "done", "pages": n_pages})
+                    done += 1
+                    pages += n_pages
+                else:
+                    append_line(mf, {"path": path, "checksum": checksum, "status": "failed", "error": error})
+                    failed += 1
+                    print(f"Error processing {path}: {error}")
+
+                elapsed = time.time() - start
+                print(f"[{done + failed}/{len(todo)}] {os.path.basename(path)} | {pages / elapsed:.2f} pages/s | "
+                      f"{done} done, {failed} failed" + (f" | {escalated / max(pages, 1):.1%} escalated" if cascade else ""))
+
+    print(f"Finished {done} documents ({pages} pages) in {time.time() - start:.1f}s, {failed} failed. "
+          f"Results in {args.output}")
+    if cascade:
+        print(f"Cascade escalated {escalated} of {pages} pages ({escalated / max(pages, 1):.1%}) to full resolution")
+    # Where the time went across all documents, most expensive span first; nested spans overlap their parents
+    print("\nTime per span:")
+    for series in METRICS.snapshot()[:12]:
+        labels = ", ".join(f"{k}={v}" for k, v in series["labels"].items())
+        print(f"  {series['name'] + (f' [{labels}]' if labels else ''):<45}{series['sum_seconds']:>10.1f}s"
+              f"{series['count']:>8} spans{series['mean_seconds'] * 1000:>10.1f}ms mean")
+    if trace_log is not None:
+        print(f"Document traces in {args.traces}")
@@ -0,0 +1,64 @@
+import json
+import argparse
+
+import numpy as np
+import torch
+
+from batch import expand_inputs
+from benchmark_compile import timed_predict
+from quantize import PAGE_EXTENSIONS, accuracy_report, calibration_pages, evaluate, print_accuracy_report
+
+
+def page_latencies(weights, pages, **kwargs):
+    """Median ms per page of a freshly loaded model, after a first page that can include lazy setup."""
+    from doclayout_yolo import YOLOv10
+
+    model = YOLOv10(weights)
+    times = [timed_predict(model, page, **kwargs) for page in pages]
+    return float(np.median(times[1:] or times))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Accuracy drift and CPU latency of bfloat16 vs FP32 layout detection.")
+    parser.add_argument('--model', default=None, required=True, type=str)
+    parser.add_argument('--data', default=None, required=True, type=str,
+                        help="labelled dataset yaml the FP32 and BF16 models are compared on")
+    parser.add_argument('--inputs', nargs='*', default=[], type=str,
+                        help="PDFs, page images, directories or glob patterns to also time full-size pages on")
+    parser.add_argument('--imgsz', default=1024, required=False, type=int)
+    parser.add_argument('--pages', default=50, required=False, type=int)
+    parser.add_argument('--max-map-drop', default=0.01, required=False, type=float,
+                        help="largest mAP50-95 drop, overall and per class, to still recommend bf16")
+    parser.add_argument('--torch-threads', default=None, required=False, type=int)
+    parser.add_argument('--report', default=None, required=False, type=str, help="save the report as JSON")
+    args = parser.parse_args()
+
+    from doclayout_yolo.utils.torch_utils import cpu_supports_bf16
+
+    if not cpu_supports_bf16():
+        raise SystemExit("This CPU has no native bfloat16 support (AVX512-BF16 or AMX), bf16 inference would run FP32")
+    if args.torch_threads:
+        torch.set_num_threads(args.torch_threads)
+
+    fp32 = evaluate(args.model, args.data, args.imgsz)
+    bf16 = evaluate(args.model, args.data, args.imgsz, bf16=True)
+    report = accuracy_report(fp32, bf16, args.max_map_drop, labels=("fp32", "bf16"))
+
+    sources = expand_inputs(args.inputs, PAGE_EXTENSIONS)
+    if sources:
+        pages = calibration_pages(sources, args.pages, args.imgsz)
+        kwargs = dict(imgsz=args.imgsz, device="cpu", rect=True, compact=True, verbose=False)
+        report["pages"] = {"count": len(pages), "fp32_ms": page_latencies(args.model, pages, **kwargs),
+                           "bf16_ms": page_latencies(args.model, pages, bf16=True, **kwargs)}
+
+    print(f"bfloat16 vs FP32 on {args.data}, {torch.get_num_threads()} torch threads")
+    print_accuracy_report(report, args.max_map_drop, labels=("fp32", "bf16"))
+    if sources:
+        p = report["pages"]
+        print(f"Pages: FP32 {p['fp32_ms']:.1f}ms, BF16 {p['bf16_ms']:.1f}ms median per page over {p['count']} pages, "
+              f"{p['fp32_ms'] / p['bf16_ms']:.2f}x speedup")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.report}")
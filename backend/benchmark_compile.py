@@ -0,0 +1,87 @@
+import os
+import glob
+import time
+import argparse
+import tempfile
+from collections import defaultdict
+
+import numpy as np
+import torch
+
+from quantize import calibration_pages
+
+
+def timed_predict(model, page, **kwargs):
+    """Run one page through the model and return the wall time in milliseconds."""
+    start = time.perf_counter()
+    model.predict(page, **kwargs)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(weights, pages, buckets, compile_dir=None, **kwargs):
+    """
+    Predict every page with a freshly loaded model.
+
+    Returns:
+        dict: Per shape bucket, the latency of its first page and the latencies of the remaining pages.
+    """
+    from doclayout_yolo import YOLOv10
+
+    model = YOLOv10(weights)
+    times = defaultdict(list)
+    for page, bucket in zip(pages, buckets):
+        times[bucket].append(timed_predict(model, page, compile=compile_dir is not None, compile_dir=compile_dir,
+                                           **kwargs))
+    return {bucket: (t[0], t[1:]) for bucket, t in times.items()}
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="CPU latency of eager vs compiled (TorchScript) layout detection.")
+    parser.add_argument('--model', default=None, required=True, type=str)
+    parser.add_argument('--inputs', nargs='+', required=True, type=str,
+                        help="PDFs, page images, directories or glob patterns to benchmark on")
+    parser.add_argument('--imgsz', default=1024, required=False, type=int)
+    parser.add_argument('--pages', default=50, required=False, type=int)
+    parser.add_argument('--rect-step', default=128, required=False, type=int)
+    parser.add_argument('--torch-threads', default=None, required=False, type=int)
+    args = parser.parse_args()
+
+    from doclayout_yolo.engine.predictor import rect_shape
+
+    if args.torch_threads:
+        torch.set_num_threads(args.torch_threads)
+
+    sources = []
+    for pattern in args.inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*")
+        sources += [p for p in sorted(glob.glob(pattern, recursive=True))
+                    if p.lower().endswith((".pdf", ".jpg", ".jpeg", ".png"))]
+    pages = calibration_pages(sources, args.pages, args.imgsz)
+    buckets = [rect_shape((p.height, p.width), (args.imgsz, args.imgsz), args.rect_step) for p in pages]
+    print(f"Benchmarking on {len(pages)} pages in {len(set(buckets))} shape buckets, "
+          f"{torch.get_num_threads()} torch threads")
+
+    kwargs = dict(imgsz=args.imgsz, device="cpu", rect=True, rect_step=args.rect_step, compact=True, verbose=False)
+    eager = run(args.model, pages, buckets, **kwargs)
+    with tempfile.TemporaryDirectory() as compile_dir:
+        cold = run(args.model, pages, buckets, compile_dir=compile_dir, **kwargs)  # traces every bucket
+        warm = run(args.model, pages, buckets, compile_dir=compile_dir, **kwargs)  # a restart, loads saved traces
+
+    def median(times):
+        return float(np.median(times)) if len(times) else float("nan")
+
+    print(f"\n{'bucket':<12}{'pages':>7}{'eager':>10}{'compiled':>10}{'speedup':>9}{'trace':>10}{'load':>10}")
+    eager_all, compiled_all = [], []
+    for bucket in sorted(eager):
+        e = eager[bucket][1]  # the first page of a bucket can include lazy setup
+        c = cold[bucket][1] + warm[bucket][1]
+        eager_all += e
+        compiled_all += c
+        print(f"{'x'.join(map(str, bucket)):<12}{len(eager[bucket][1]) + 1:>7}{median(e):>10.1f}{median(c):>10.1f}"
+              f"{median(e) / median(c):>8.2f}x{cold[bucket][0]:>10.1f}{warm[bucket][0]:>10.1f}")
+    print(f"{'all':<12}{len(pages):>7}{median(eager_all):>10.1f}{median(compiled_all):>10.1f}"
+          f"{median(eager_all) / median(compiled_all):>8.2f}x")
+    print("\nMedian ms per page after the first page of each bucket; 'trace' is the first compiled page of a bucket, "
+          "'load' the same page for a newly loaded model that reuses the saved trace.")
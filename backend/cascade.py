@@ -0,0 +1,103 @@
+import json
+import threading
+from collections import Counter
+
+import numpy as np
+
+
+class CascadePolicy:
+    """
+    Decide which pages a cheap low-resolution detection pass is not good enough for.
+
+    Pages are first detected at `coarse_imgsz` with the confidence threshold lowered to `floor_conf`, so borderline
+    elements show up. A page is escalated to the full-resolution pass when its coarse detections are dense, uncertain
+    or small; otherwise the coarse detections above the caller's threshold are its result.
+
+    Args:
+        coarse_imgsz (int): Input size of the coarse pass.
+        floor_conf (float): Confidence threshold of the coarse pass.
+        min_conf (float): Detections between floor_conf and min_conf are uncertain.
+        max_uncertain (int): Escalate pages with more uncertain detections than this.
+        max_elements (int): Escalate pages with more detected elements than this.
+        small_area (float): Elements smaller than this fraction of the page area are small.
+        max_small (int): Escalate pages with more small elements than this.
+    """
+
+    def __init__(self, coarse_imgsz=640, floor_conf=0.1, min_conf=0.5, max_uncertain=2, max_elements=20,
+                 small_area=0.001, max_small=3):
+        self.coarse_imgsz = coarse_imgsz
+        self.floor_conf = floor_conf
+        self.min_conf = min_conf
+        self.max_uncertain = max_uncertain
+        self.max_elements = max_elements
+        self.small_area = small_area
+        self.max_small = max_small
+
+    @classmethod
+    def from_json(cls, text):
+        """Policy from a JSON object of overrides, e.g. '{"coarse_imgsz": 512, "max_elements": 15}'."""
+        return cls(**json.loads(text)) if text else cls()
+
+    def escalate(self, det, shape, conf):
+        """
+        Check the coarse detections of one page.
+
+        Args:
+            det (Detections): Compact coarse detections in page pixels.
+            shape (tuple): Page (h, w).
+            conf (float): Confidence threshold of the final result.
+
+        Returns:
+            str | None: Why the page needs the full-resolution pass, or None if the coarse result stands.
+        """
+        kept = det["conf"] > conf
+        if kept.sum() > self.max_elements:
+            return "dense"
+        if ((det["conf"] > self.floor_conf) & (det["conf"] < self.min_conf)).sum() > self.max_uncertain:
+            return "low_confidence"
+        xyxy = det["xyxy"][kept]
+        areas = np.prod(xyxy[:, 2:] - xyxy[:, :2], axis=1) / (shape[0] * shape[1])
+        if (areas < self.small_area).sum() > self.max_small:
+            return "small_elements"
+        return None
+
+    def settings(self):
+        """Everything about the policy that changes the output, for cache keys."""
+        return dict(vars(self))
+
+
+class CascadeStats:
+    """
+    Thread-safe counts of pages run through the cascade and why they were escalated.
+
+    Args:
+        metrics (MetricsRegistry, optional): Registry the counts are also published to, as the `cascade_pages` and
+            `cascade_escalations` (by reason) counters.
+    """
+
+    def __init__(self, metrics=None):
+        self._lock = threading.Lock()
+        self.metrics = metrics
+        self.pages = 0
+        self.reasons = Counter()
+
+    def record(self, reasons):
+        """Count the escalation reasons of a batch of pages, None for pages settled by the coarse pass."""
+        escalated = Counter(r for r in reasons if r)
+        with self._lock:
+            self.pages += len(reasons)
+            self.reasons.update(escalated)
+        if self.metrics is not None:
+            self.metrics.increment("cascade_pages", len(reasons))
+            for reason, n in escalated.items():
+                self.metrics.increment("cascade_escalations", n, reason=reason)
+
+    def summary(self):
+        with self._lock:
+            escalated = sum(self.reasons.values())
+            return {
+                "pages": self.pages,
+                "escalated": escalated,
+                "escalated_share": escalated / self.pages if self.pages else 0.0,
+                "reasons": dict(self.reasons),
+            }
@@ -2,13 +2,39 @@
 
 __version__ = "0.0.2"
 
-from doclayout_yolo.data.explorer.explorer import Explorer
-from doclayout_yolo.models import RTDETR, SAM, YOLO, YOLOWorld, YOLOv10
-from doclayout_yolo.models.fastsam import FastSAM
-from doclayout_yolo.models.nas import NAS
-from doclayout_yolo.utils import ASSETS, SETTINGS as settings
-from doclayout_yolo.utils.checks import check_yolo as checks
-from doclayout_yolo.utils.downloads import download
+import importlib
+
+# Public names and the modules they live in; each is imported on first attribute access, so `import doclayout_yolo`
+# loads nothing else and `from doclayout_yolo import YOLOv10` does not pull in SAM, RTDETR or the Explorer stack
+_LAZY_ATTRS = {
+    "YOLO": ("doclayout_yolo.models.yolo", "YOLO"),
+    "YOLOWorld": ("doclayout_yolo.models.yolo", "YOLOWorld"),
+    "YOLOv10": ("doclayout_yolo.models.yolov10", "YOLOv10"),
+    "RTDETR": ("doclayout_yolo.models.rtdetr", "RTDETR"),
+    "SAM": ("doclayout_yolo.models.sam", "SAM"),
+    "FastSAM": ("doclayout_yolo.models.fastsam", "FastSAM"),
+    "NAS": ("doclayout_yolo.models.nas", "NAS"),
+    "Explorer": ("doclayout_yolo.data.explorer.explorer", "Explorer"),
+    "ASSETS": ("doclayout_yolo.utils", "ASSETS"),
+    "settings": ("doclayout_yolo.utils", "SETTINGS"),
+    "checks": ("doclayout_yolo.utils.checks", "check_yolo"),
+    "download": ("doclayout_yolo.utils.downloads", "download"),
+}
+
+
+def __getattr__(name):
+    """Import public classes and functions on first access."""
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module, attr = _LAZY_ATTRS[name]
+    value = getattr(importlib.import_module(module), attr)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRS))
+
 
 __all__ = (
     "__version__",
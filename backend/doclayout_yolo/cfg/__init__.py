@@ -98,6 +98,7 @@ CLI_HELP_MSG = f"""
 CFG_FLOAT_KEYS = {"warmup_epochs", "box", "cls", "dfl", "degrees", "shear", "time"}
 CFG_FRACTION_KEYS = {
     "dropout",
+    "tile_overlap",
     "iou",
     "lr0",
     "lrf",
@@ -121,6 +122,7 @@ CFG_FRACTION_KEYS = {
     "conf",
     "iou",
     "fraction",
+    "dedup_iou",
 }  # fraction floats 0.0 - 1.0
 CFG_INT_KEYS = {
     "epochs",
@@ -132,6 +134,8 @@ CFG_INT_KEYS = {
     "mask_ratio",
     "max_det",
     "vid_stride",
+    "rect_step",
+    "tile",
     "line_width",
     "workspace",
     "nbs",
@@ -144,12 +148,14 @@ CFG_BOOL_KEYS = {
     "deterministic",
     "single_cls",
     "rect",
+    "compile",
     "cos_lr",
     "overlap_mask",
     "val",
     "save_json",
     "save_hybrid",
     "half",
+    "bf16",
     "dnn",
     "plots",
     "show",
@@ -162,6 +168,7 @@ CFG_BOOL_KEYS = {
     "visualize",
     "augment",
     "agnostic_nms",
+    "compact",
     "retina_masks",
     "show_boxes",
     "keras",
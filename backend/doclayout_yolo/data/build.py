@@ -203,7 +203,7 @@ def load_inference_source(source=None, batch=1, vid_stride=1, buffer=False):
     elif screenshot:
         dataset = LoadScreenshots(source)
     elif from_img:
-        dataset = LoadPilAndNumpy(source)
+        dataset = LoadPilAndNumpy(source, batch=batch)
     else:
         dataset = LoadImagesAndVideos(source, batch=batch, vid_stride=vid_stride)
 
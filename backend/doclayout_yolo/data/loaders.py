@@ -391,24 +391,37 @@ class LoadPilAndNumpy:
     It performs basic validation and format conversion to ensure that the images are in the required format for
     downstream processing.
 
+    Images are yielded in their original order, in batches of up to `batch` consecutive images that share the same
+    shape, so every batch can be letterboxed to a single minimal rectangle.
+
     Attributes:
         paths (list): List of image paths or autogenerated filenames.
         im0 (list): List of images stored as Numpy arrays.
         mode (str): Type of data being processed, defaults to 'image'.
-        bs (int): Batch size, equivalent to the length of `im0`.
+        bs (int): Batch size, the largest number of images yielded at once.
+        batches (list): (start, end) index ranges of `im0` yielded as one batch each.
 
     Methods:
         _single_check(im): Validate and format a single image to a Numpy array.
     """
 
-    def __init__(self, im0):
+    def __init__(self, im0, batch=1):
         """Initialize PIL and Numpy Dataloader."""
         if not isinstance(im0, list):
             im0 = [im0]
         self.paths = [getattr(im, "filename", f"image{i}.jpg") for i, im in enumerate(im0)]
         self.im0 = [self._single_check(im) for im in im0]
         self.mode = "image"
-        self.bs = len(self.im0)
+
+        # Split into runs of same-shape images, at most `batch` long
+        batch = max(1, batch)
+        self.batches = []
+        for i, im in enumerate(self.im0):
+            if self.batches and i - self.batches[-1][0] < batch and im.shape == self.im0[self.batches[-1][0]].shape:
+                self.batches[-1][1] = i + 1
+            else:
+                self.batches.append([i, i + 1])
+        self.bs = max((end - start for start, end in self.batches), default=0)
 
     @staticmethod
     def _single_check(im):
@@ -427,10 +440,11 @@ class LoadPilAndNumpy:
 
     def __next__(self):
         """Returns batch paths, images, processed images, None, ''."""
-        if self.count == 1:  # loop only once as it's batch inference
+        if self.count == len(self.batches):
             raise StopIteration
+        start, end = self.batches[self.count]
         self.count += 1
-        return self.paths, self.im0, [""] * self.bs
+        return self.paths[start:end], self.im0[start:end], [""] * (end - start)
 
     def __iter__(self):
         """Enables iteration for class LoadPilAndNumpy."""
@@ -140,6 +140,35 @@ def try_export(inner_func):
     return outer_func
 
 
+def int8_ignored_scope(model):
+    """
+    Return the nncf.IgnoredScope that keeps the box decoding ops of a detection head in floating point.
+
+    Args:
+        model (nn.Module): The PyTorch model the OpenVINO model was converted from.
+
+    Returns:
+        nncf.IgnoredScope | None: None for models without a Detect head.
+    """
+    import nncf
+
+    if isinstance(model.model[-1], Detect):
+        # Includes all Detect subclasses like Segment, Pose, OBB, WorldDetect
+        head_module_name = ".".join(list(model.named_modules())[-1][0].split(".")[:2])
+
+        return nncf.IgnoredScope(  # ignore operations
+            patterns=[
+                f".*{head_module_name}/.*/Add",
+                f".*{head_module_name}/.*/Sub*",
+                f".*{head_module_name}/.*/Mul*",
+                f".*{head_module_name}/.*/Div*",
+                f".*{head_module_name}\\.dfl.*",
+            ],
+            types=["Sigmoid"],
+        )
+    return None
+
+
 class Exporter:
     """
     A class for exporting a model.
@@ -223,7 +252,7 @@ class Exporter:
             p.requires_grad = False
         model.eval()
         model.float()
-        # model = model.fuse()
+        model = model.fuse()
         for m in model.modules():
             if isinstance(m, (Detect, RTDETRDecoder)):  # includes all Detect subclasses like Segment, Pose, OBB
                 m.dynamic = self.args.dynamic
@@ -469,24 +498,11 @@ class Exporter:
                 LOGGER.warning(f"{prefix} WARNING ⚠️ >300 images recommended for INT8 calibration, found {n} images.")
             quantization_dataset = nncf.Dataset(dataset, transform_fn)
 
-            ignored_scope = None
-            if isinstance(self.model.model[-1], Detect):
-                # Includes all Detect subclasses like Segment, Pose, OBB, WorldDetect
-                head_module_name = ".".join(list(self.model.named_modules())[-1][0].split(".")[:2])
-
-                ignored_scope = nncf.IgnoredScope(  # ignore operations
-                    patterns=[
-                        f".*{head_module_name}/.*/Add",
-                        f".*{head_module_name}/.*/Sub*",
-                        f".*{head_module_name}/.*/Mul*",
-                        f".*{head_module_name}/.*/Div*",
-                        f".*{head_module_name}\\.dfl.*",
-                    ],
-                    types=["Sigmoid"],
-                )
-
             quantized_ov_model = nncf.quantize(
-                ov_model, quantization_dataset, preset=nncf.QuantizationPreset.MIXED, ignored_scope=ignored_scope
+                ov_model,
+                quantization_dataset,
+                preset=nncf.QuantizationPreset.MIXED,
+                ignored_scope=int8_ignored_scope(self.model),
             )
             serialize(quantized_ov_model, fq_ov)
             return fq, None
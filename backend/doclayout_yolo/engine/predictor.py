@@ -29,9 +29,12 @@ Usage - formats:
                               yolov8n_ncnn_model         # NCNN
 """
 
+import math
 import platform
+import queue
 import re
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import cv2
@@ -60,6 +63,30 @@ Example:
 """
 
 
+def rect_shape(shape, imgsz, step=128, stride=32):
+    """
+    Bucketed letterbox shape for rectangular inference.
+
+    The image is scaled exactly as it would be for the square `imgsz` input, and each side is padded up to a multiple
+    of `step` (itself rounded up to a multiple of `stride`) instead of to the full `imgsz`. A portrait page at
+    imgsz=1024 becomes e.g. 1024x768 rather than 1024x1024, and all pages of a similar aspect ratio share that shape,
+    so they batch together and traced or exported models see only a handful of input shapes. With step=stride this is
+    the minimal rectangle, 1024x736 for A4, which eager PyTorch models use.
+
+    Args:
+        shape (tuple): Image (h, w).
+        imgsz (list): Square or rectangular inference size (h, w).
+        step (int): Bucket granularity in pixels.
+        stride (int): Model stride.
+
+    Returns:
+        (tuple): Letterbox (h, w), never larger than `imgsz`.
+    """
+    step = max(math.ceil(step / stride), 1) * stride
+    r = min(imgsz[0] / shape[0], imgsz[1] / shape[1])
+    return tuple(min(math.ceil(s * r / step) * step, m) for s, m in zip(shape, imgsz))
+
+
 class BasePredictor:
     """
     BasePredictor.
@@ -75,6 +102,7 @@ class BasePredictor:
         device (torch.device): Device used for prediction.
         dataset (Dataset): Dataset used for prediction.
         vid_writer (dict): Dictionary of {save_path: video_writer, ...} writer for saving video output.
+        profilers (tuple): Preprocess, inference and postprocess ops.Profile of the current predict call.
     """
 
     def __init__(self, cfg=DEFAULT_CFG, overrides=None, _callbacks=None):
@@ -106,6 +134,7 @@ class BasePredictor:
         self.windows = []
         self.batch = None
         self.results = None
+        self.profilers = None
         self.transforms = None
         self.callbacks = _callbacks or callbacks.get_default_callbacks()
         self.txt_path = None
@@ -127,7 +156,7 @@ class BasePredictor:
             im = torch.from_numpy(im)
 
         im = im.to(self.device)
-        im = im.half() if self.model.fp16 else im.float()  # uint8 to fp16/32
+        im = im.half() if self.model.fp16 else im.float()  # uint8 to fp16/32, bf16 autocast casts FP32 inputs per op
         if not_tensor:
             im /= 255  # 0 - 255 to 0.0 - 1.0
         return im
@@ -151,6 +180,14 @@ class BasePredictor:
         Returns:
             (list): A list of transformed images.
         """
+        if self.args.rect:
+            # Traced and exported models pay per distinct shape, so they get coarse buckets; eager PyTorch runs any
+            # shape at the same cost and keeps the minimal stride-aligned rectangle
+            step = self.args.rect_step if self.model.trace or not self.model.pt else self.model.stride
+            # One shape per batch, large enough for every image in it
+            shapes = [rect_shape(x.shape[:2], self.imgsz, step, self.model.stride) for x in im]
+            letterbox = LetterBox((max(s[0] for s in shapes), max(s[1] for s in shapes)), stride=self.model.stride)
+            return [letterbox(image=x) for x in im]
         same_shapes = len({x.shape for x in im}) == 1
         letterbox = LetterBox(self.imgsz, auto=same_shapes and self.model.pt, stride=self.model.stride)
         return [letterbox(image=x) for x in im]
@@ -229,7 +266,7 @@ class BasePredictor:
                 self.done_warmup = True
 
             self.seen, self.windows, self.batch = 0, [], None
-            profilers = (
+            self.profilers = profilers = (
                 ops.Profile(device=self.device),
                 ops.Profile(device=self.device),
                 ops.Profile(device=self.device),
@@ -294,19 +331,26 @@ class BasePredictor:
 
     def setup_model(self, model, verbose=True):
         """Initialize YOLO model with given parameters and set it to evaluation mode."""
+        weights = model or self.args.model
+        # Prepared inference weights are fused already, fusing again would replace the shared tensors with copies
+        fused = isinstance(weights, torch.nn.Module) and hasattr(weights, "is_fused") and weights.is_fused()
         self.model = AutoBackend(
-            weights=model or self.args.model,
+            weights=weights,
             device=select_device(self.args.device, verbose=verbose),
             dnn=self.args.dnn,
             data=self.args.data,
             fp16=self.args.half,
+            bf16=self.args.bf16,
             batch=self.args.batch,
-            fuse=False,
+            fuse=not fused,
             verbose=verbose,
+            trace=self.args.compile,
+            trace_dir=self.args.compile_dir,
         )
 
         self.device = self.model.device  # update device
         self.args.half = self.model.fp16  # update half
+        self.args.bf16 = self.model.bf16  # update bf16
         self.model.eval()
 
     def write_results(self, i, p, im, s):
@@ -395,3 +439,73 @@ class BasePredictor:
     def add_callback(self, event: str, func):
         """Add callback."""
         self.callbacks[event].append(func)
+
+
+class PredictorPool:
+    """
+    Run predictions with one model from several threads at once.
+
+    BasePredictor keeps per-call state (dataset, batch, results) on the instance and serializes calls with a lock, so
+    a single predictor cannot serve parallel requests. The pool holds one predictor per worker thread instead, all
+    sharing the AutoBackend of the first one, so the weights are loaded once. Intra-op threads are partitioned: each
+    worker sets torch.set_num_threads(threads) for itself, by default an equal share of the current setting.
+
+    Args:
+        model (Model): Model to predict with, i.e. a YOLOv10 instance.
+        workers (int): Number of concurrent predictions.
+        threads (int, optional): Intra-op threads per worker.
+        **kwargs: Predict arguments shared by all calls, i.e. imgsz or device.
+
+    Example:
+        ```python
+        with PredictorPool(YOLOv10("model.pt"), workers=4, imgsz=1024) as pool:
+            results = pool.predict("page.jpg", conf=0.25)
+        ```
+    """
+
+    def __init__(self, model, workers=2, threads=None, **kwargs):
+        """Set up the shared model and one predictor per worker."""
+        self.workers = workers
+        self.threads = threads or max(torch.get_num_threads() // workers, 1)
+        self.names = model.names
+        self.args = {**model.overrides, "conf": 0.25, "batch": 1, "save": False, "mode": "predict", **kwargs}
+        predictor_class = model._smart_load("predictor")
+
+        first = predictor_class(overrides=self.args, _callbacks=model.callbacks)
+        first.setup_model(model=model.model, verbose=False)
+        self._idle = queue.SimpleQueue()
+        self._idle.put(first)
+        for _ in range(workers - 1):
+            predictor = predictor_class(overrides=self.args, _callbacks=model.callbacks)
+            predictor.model, predictor.device = first.model, first.device  # shared, read-only during inference
+            predictor.args.half, predictor.args.bf16 = first.args.half, first.args.bf16
+            self._idle.put(predictor)
+
+        self._executor = ThreadPoolExecutor(
+            workers, thread_name_prefix="predictor", initializer=torch.set_num_threads, initargs=(self.threads,)
+        )
+
+    def _run(self, source, kwargs):
+        predictor = self._idle.get()  # never blocks, there are as many predictors as worker threads
+        try:
+            predictor.args = get_cfg(self.args, kwargs)  # per-call arguments do not leak into later calls
+            return predictor(source=source, stream=False)
+        finally:
+            self._idle.put(predictor)
+
+    def submit(self, source, **kwargs):
+        """Queue a prediction and return a concurrent.futures.Future for its list of results."""
+        return self._executor.submit(self._run, source, kwargs)
+
+    def predict(self, source, **kwargs):
+        """Predict on `source` with the next free worker, blocking until the results are ready."""
+        return self.submit(source, **kwargs).result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
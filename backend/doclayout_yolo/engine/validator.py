@@ -130,6 +130,7 @@ class BaseValidator:
                     dnn=self.args.dnn,
                     data=self.args.data,
                     fp16=self.args.half,
+                    bf16=self.args.bf16,
                     fuse=False,
                 )
             else:
@@ -139,11 +140,13 @@ class BaseValidator:
                     dnn=self.args.dnn,
                     data=self.args.data,
                     fp16=self.args.half,
+                    bf16=self.args.bf16,
                 )
                 
             # self.model = model
             self.device = model.device  # update device
             self.args.half = model.fp16  # update half
+            self.args.bf16 = model.bf16  # update bf16
             stride, pt, jit, engine = model.stride, model.pt, model.jit, model.engine
             imgsz = check_imgsz(self.args.imgsz, stride=stride)
             if engine:
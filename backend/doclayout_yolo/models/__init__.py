@@ -1,8 +1,24 @@
 # Ultralytics YOLO 🚀, AGPL-3.0 license
 
-from .rtdetr import RTDETR
-from .sam import SAM
-from .yolo import YOLO, YOLOWorld
-from .yolov10 import YOLOv10
+import importlib
+
+# Model families are imported on first access, see doclayout_yolo/__init__.py
+_LAZY_ATTRS = {
+    "RTDETR": ".rtdetr",
+    "SAM": ".sam",
+    "YOLO": ".yolo",
+    "YOLOWorld": ".yolo",
+    "YOLOv10": ".yolov10",
+}
+
+
+def __getattr__(name):
+    """Import a model family on first access."""
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = "YOLO", "RTDETR", "SAM", "YOLOWorld", "YOLOv10"  # allow simpler import
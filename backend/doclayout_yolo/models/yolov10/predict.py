@@ -1,16 +1,142 @@
 from doclayout_yolo.models.yolo.detect import DetectionPredictor
+import math
+import numpy as np
 import torch
+import torchvision
 from doclayout_yolo.utils import ops
 from doclayout_yolo.engine.results import Results
+from doclayout_yolo.nn.modules import v10Detect
+
+DETECTION_DTYPE = np.dtype([("xyxy", np.float32, (4,)), ("conf", np.float32), ("cls", np.int32)])
+TILE_MERGE_IOS = 0.6  # intersection over the smaller box above which same-class tiled detections are duplicates
+
+
+class Detections(np.ndarray):
+    """
+    Compact detections of one image, returned by YOLOv10DetectionPredictor when `compact=True`.
+
+    A structured array of DETECTION_DTYPE records, i.e. `det["xyxy"]` is (N, 4) in original image pixels,
+    `det["conf"]` and `det["cls"]` are (N,). Carries the `names`, `path` and `speed` attributes the predictor sets.
+    """
+
+    def verbose(self):
+        """Return a log string of detection counts per class."""
+        classes, counts = np.unique(self["cls"], return_counts=True)
+        log = "".join(f"{n} {self.names[int(c)]}{'s' * (n > 1)}, " for c, n in zip(classes, counts))
+        return log or "(no detections), "
+
+
+def tile_offsets(length, tile, overlap, stride=32):
+    """Stride-aligned start offsets of overlapping `tile`-long windows covering `length` pixels."""
+    if length <= tile:
+        return [0]
+    n = math.ceil((length - tile) / max(tile * (1 - overlap), stride)) + 1
+    return [min(round(k * (length - tile) / (n - 1) / stride) * stride, length - tile) for k in range(n)]
+
+
+def box_intersections(boxes):
+    """Pairwise intersection areas of (N, 4) xyxy boxes, negative where boxes do not touch."""
+    wh = torch.min(boxes[:, None, 2:], boxes[None, :, 2:]) - torch.max(boxes[:, None, :2], boxes[None, :, :2])
+    return torch.where((wh >= 0).all(-1), wh.clamp(min=0).prod(-1), torch.full_like(wh[..., 0], -1))
+
+
+def merge_cut_boxes(p):
+    """
+    Union same-class detections that touch, i.e. the parts of one element cut apart by tile seams.
+
+    Args:
+        p (torch.Tensor): (N, 6) detections cut by an interior tile edge.
+
+    Returns:
+        (torch.Tensor): One detection per connected group, with the union box and the highest confidence.
+    """
+    if len(p) < 2:
+        return p
+    linked = (box_intersections(p[:, :4]) >= 0) & (p[:, None, 5] == p[None, :, 5])
+    labels = torch.arange(len(p), device=p.device)
+    while True:  # propagate the smallest label through each connected group
+        new = torch.where(linked, labels[None, :], len(p)).min(1).values
+        if torch.equal(new, labels):
+            break
+        labels = new
+    merged = []
+    for label in labels.unique():
+        g = p[labels == label]
+        merged.append(torch.cat([g[:, :2].min(0).values, g[:, 2:4].max(0).values, g[:, 4:5].max(0).values, g[:1, 5]]))
+    return torch.stack(merged)
+
+
+def dedup_boxes(p, thresh=TILE_MERGE_IOS):
+    """Greedily drop same-class detections covered more than `thresh` by a more confident one (intersection/smaller)."""
+    if len(p) < 2:
+        return p
+    p = p[p[:, 4].argsort(descending=True)]
+    area = (p[:, 2:4] - p[:, :2]).clamp(min=0).prod(-1)
+    ios = box_intersections(p[:, :4]).clamp(min=0) / torch.min(area[:, None], area[None, :]).clamp(min=1e-9)
+    dup = ((ios > thresh) & (p[:, None, 5] == p[None, :, 5])).triu(1).cpu()
+    keep = torch.ones(len(p), dtype=torch.bool)
+    for i in range(len(p)):
+        if keep[i]:
+            keep &= ~dup[i]
+    return p[keep.to(p.device)]
 
 
 class YOLOv10DetectionPredictor(DetectionPredictor):
-    def postprocess(self, preds, img, orig_imgs):
+    def setup_model(self, model, verbose=True):
+        """Initialize the model and switch its v10Detect heads to one2one-only inference."""
+        super().setup_model(model, verbose)
+        for m in self.model.modules():
+            if isinstance(m, v10Detect):
+                m.one2one_only = True
+
+    def preprocess(self, im):
+        """
+        Prepare images for inference, splitting large pages into tiles when `tile` is set.
+
+        Pages whose longer side exceeds `tile` pixels are cut into overlapping imgsz windows at their native resolution,
+        so the number of forward passes grows with the page area. Each tiled page is also run whole at imgsz for the
+        elements larger than the tile overlap. `self.tiles` records (image index, x0, y0, h, w) per model input.
+        """
+        self.tiles = None
+        if not self.args.tile or isinstance(im, torch.Tensor):
+            return super().preprocess(im)
+
+        self.tiles, crops = [], []
+        stride = int(self.model.stride)
+        for i, x in enumerate(im):
+            h, w = x.shape[:2]
+            self.tiles.append((i, 0, 0, h, w))  # whole page
+            crops.append(x)
+            if max(h, w) > self.args.tile:
+                for y0 in tile_offsets(h, self.imgsz[0], self.args.tile_overlap, stride):
+                    for x0 in tile_offsets(w, self.imgsz[1], self.args.tile_overlap, stride):
+                        crop = x[y0 : y0 + self.imgsz[0], x0 : x0 + self.imgsz[1]]
+                        self.tiles.append((i, x0, y0, *crop.shape[:2]))
+                        crops.append(crop)
+        return super().preprocess(crops)
+
+    def inference(self, im, *args, **kwargs):
+        """Run inference, `batch` tiles at a time when the inputs are tiles."""
+        if self.tiles is None:
+            return super().inference(im, *args, **kwargs)
+        bs = max(self.args.batch, 1)
+        preds = []
+        for i in range(0, len(im), bs):
+            preds.append(self.raw_preds(super().inference(im[i : i + bs], *args, **kwargs)))
+        return torch.cat(preds)
+
+    @staticmethod
+    def raw_preds(preds):
+        """The one2one prediction tensor from the model output."""
         if isinstance(preds, dict):
             preds = preds["one2one"]
 
         if isinstance(preds, (list, tuple)):
             preds = preds[0]
+        return preds
+
+    def postprocess(self, preds, img, orig_imgs):
+        preds = self.raw_preds(preds)
 
         if preds.shape[-1] == 6:
             pass
@@ -20,10 +146,16 @@ class YOLOv10DetectionPredictor(DetectionPredictor):
             bboxes = ops.xywh2xyxy(bboxes)
             preds = torch.cat([bboxes, scores.unsqueeze(-1), labels.unsqueeze(-1)], dim=-1)
 
+        if self.tiles is not None:
+            return self.postprocess_tiled(preds, img, orig_imgs)
+
+        if self.args.compact:
+            return self.postprocess_compact(preds, img, orig_imgs)
+
         mask = preds[..., 4] > self.args.conf
         if self.args.classes is not None:
             mask = mask & (preds[..., 5:6] == torch.tensor(self.args.classes, device=preds.device).unsqueeze(0)).any(2)
-        
+
         preds = [p[mask[idx]] for idx, p in enumerate(preds)]
 
         if not isinstance(orig_imgs, list):  # input images are a torch.Tensor, not a list
@@ -36,3 +168,85 @@ class YOLOv10DetectionPredictor(DetectionPredictor):
             img_path = self.batch[0][i]
             results.append(Results(orig_img, path=img_path, names=self.model.names, boxes=pred))
         return results
+
+    def postprocess_compact(self, preds, img, orig_imgs):
+        """
+        Filter, deduplicate and rescale (B, N, 6) predictions with batch-wide tensor ops and return Detections.
+
+        Boxes of a same-shape batch are rescaled in a single op; no Results objects or per-box Python work is done.
+        """
+        if self.args.save or self.args.show or self.args.save_txt or self.args.save_crop:
+            raise ValueError("compact=True results cannot be plotted or saved, predict with compact=False instead.")
+
+        if isinstance(orig_imgs, list):
+            orig_shapes = [im.shape[:2] for im in orig_imgs]
+        else:  # input images are a torch.Tensor
+            orig_shapes = [tuple(orig_imgs.shape[2:])] * len(orig_imgs)
+        if len(set(orig_shapes)) == 1:
+            preds[..., :4] = ops.scale_boxes(img.shape[2:], preds[..., :4], orig_shapes[0])
+        else:
+            for p, shape in zip(preds, orig_shapes):
+                p[:, :4] = ops.scale_boxes(img.shape[2:], p[:, :4], shape)
+
+        keep = preds[..., 4] > self.args.conf
+        if self.args.classes is not None:
+            keep &= (preds[..., 5:6] == torch.tensor(self.args.classes, device=preds.device)).any(-1)
+
+        results = []
+        for i, p in enumerate(preds):
+            p = p[keep[i]]
+            if self.args.dedup_iou is not None and len(p):
+                if self.args.agnostic_nms:
+                    p = p[torchvision.ops.nms(p[:, :4], p[:, 4], self.args.dedup_iou)]
+                else:
+                    p = p[torchvision.ops.batched_nms(p[:, :4], p[:, 4], p[:, 5].int(), self.args.dedup_iou)]
+            results.append(self.compact_result(p, self.batch[0][i]))
+        return results
+
+    def compact_result(self, p, path):
+        """Detections of one image from its (N, 6) predictions in original image pixels."""
+        p = p.float().cpu().numpy()
+        det = np.empty(len(p), dtype=DETECTION_DTYPE).view(Detections)
+        det["xyxy"], det["conf"], det["cls"] = p[:, :4], p[:, 4], p[:, 5]
+        det.names, det.path = self.model.names, path
+        return det
+
+    def postprocess_tiled(self, preds, img, orig_imgs):
+        """
+        Map tile and whole-page predictions back to their pages and merge them across tile seams.
+
+        Detections cut by an interior tile edge are unioned with the same-class parts they touch in neighbouring
+        tiles. Those, the uncut tile detections and the whole-page detections are then deduplicated per class,
+        keeping the most confident of boxes that mostly cover one another.
+        """
+        margin = int(self.model.stride)  # boxes this close to an interior tile edge are treated as cut
+        parts = [[] for _ in orig_imgs]
+        for p, (i, x0, y0, h, w) in zip(preds, self.tiles):
+            p = p[p[:, 4] > self.args.conf]
+            if self.args.classes is not None:
+                p = p[(p[:, 5:6] == torch.tensor(self.args.classes, device=p.device)).any(-1)]
+            p[:, :4] = ops.scale_boxes(img.shape[2:], p[:, :4], (h, w))
+            page_h, page_w = orig_imgs[i].shape[:2]
+            cut = torch.zeros(len(p), dtype=torch.bool, device=p.device)
+            if x0 > 0:
+                cut |= p[:, 0] < margin
+            if y0 > 0:
+                cut |= p[:, 1] < margin
+            if x0 + w < page_w:
+                cut |= p[:, 2] > w - margin
+            if y0 + h < page_h:
+                cut |= p[:, 3] > h - margin
+            p[:, [0, 2]] += x0
+            p[:, [1, 3]] += y0
+            parts[i].append((p, cut))
+
+        results = []
+        for i, page in enumerate(parts):
+            p = torch.cat([p for p, _ in page])
+            cut = torch.cat([c for _, c in page])
+            p = dedup_boxes(torch.cat([p[~cut], merge_cut_boxes(p[cut])]))
+            if self.args.compact:
+                results.append(self.compact_result(p, self.batch[0][i]))
+            else:
+                results.append(Results(orig_imgs[i], path=self.batch[0][i], names=self.model.names, boxes=p))
+        return results
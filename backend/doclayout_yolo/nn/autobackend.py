@@ -2,8 +2,12 @@
 
 import ast
 import contextlib
+import hashlib
 import json
+import os
 import platform
+import re
+import threading
 import zipfile
 from collections import OrderedDict, namedtuple
 from pathlib import Path
@@ -14,9 +18,33 @@ import torch
 import torch.nn as nn
 from PIL import Image
 
-from doclayout_yolo.utils import ARM64, LINUX, LOGGER, ROOT, yaml_load
+from doclayout_yolo.utils import ARM64, LINUX, LOGGER, ROOT, USER_CONFIG_DIR, yaml_load
 from doclayout_yolo.utils.checks import check_requirements, check_suffix, check_version, check_yaml
 from doclayout_yolo.utils.downloads import attempt_download_asset, is_url
+from doclayout_yolo.utils.torch_utils import cpu_supports_bf16
+
+
+def float_outputs(y):
+    """Cast the bfloat16 tensors in (nested) model outputs back to FP32 for postprocessing."""
+    if isinstance(y, torch.Tensor):
+        return y.float() if y.dtype == torch.bfloat16 else y
+    if isinstance(y, dict):
+        return {k: float_outputs(v) for k, v in y.items()}
+    if isinstance(y, (list, tuple)):
+        return type(y)(float_outputs(x) for x in y)
+    return y
+
+
+def first_outputs(y, n):
+    """Keep the first `n` batch entries of (nested) model outputs, e.g. to drop batch padding."""
+    if isinstance(y, torch.Tensor):
+        return y[:n]
+    if isinstance(y, dict):
+        return {k: first_outputs(v, n) for k, v in y.items()}
+    if isinstance(y, (list, tuple)):
+        return type(y)(first_outputs(x, n) for x in y)
+    return y
+
 
 def check_class_names(names):
     """
@@ -49,6 +77,23 @@ def default_class_names(data=None):
     return {i: f"class{i}" for i in range(999)}  # return default if above errors
 
 
+def model_fingerprint(model):
+    """
+    Hash a PyTorch model's weights and the plain attributes of its modules.
+
+    Two models with the same fingerprint trace to the same graph: fusing changes the state dict, and inference
+    switches such as v10Detect.one2one_only are module attributes.
+    """
+    h = hashlib.sha256()
+    for k, v in model.state_dict().items():
+        h.update(k.encode())
+        h.update(v.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy().tobytes())
+    for name, m in model.named_modules():
+        attrs = {k: v for k, v in vars(m).items() if isinstance(v, (bool, int, float, str)) and k != "training"}
+        h.update(f"{name}:{type(m).__name__}:{sorted(attrs.items())}".encode())
+    return h.hexdigest()[:16]
+
+
 class AutoBackend(nn.Module):
     """
     Handles dynamic backend selection for running inference using Ultralytics YOLO models.
@@ -85,9 +130,12 @@ class AutoBackend(nn.Module):
         dnn=False,
         data=None,
         fp16=False,
+        bf16=False,
         batch=1,
         fuse=True,
         verbose=True,
+        trace=False,
+        trace_dir=None,
     ):
         """
         Initialize the AutoBackend for inference.
@@ -98,9 +146,14 @@ class AutoBackend(nn.Module):
             dnn (bool): Use OpenCV DNN module for ONNX inference. Defaults to False.
             data (str | Path | optional): Path to the additional data.yaml file containing class names. Optional.
             fp16 (bool): Enable half-precision inference. Supported only on specific backends. Defaults to False.
+            bf16 (bool): Run PyTorch models on CPU under bfloat16 autocast with channels_last inputs and weights, if
+                the CPU supports bf16 natively. Defaults to False.
             batch (int): Batch-size to assume for inference.
             fuse (bool): Fuse Conv2D + BatchNorm layers for optimization. Defaults to True.
             verbose (bool): Enable verbose logging. Defaults to True.
+            trace (bool): Run PyTorch models as frozen TorchScript traces, one per input shape. Defaults to False.
+            trace_dir (str | Path, optional): Directory the traces are saved to and reused from across processes.
+                Defaults to '<user config dir>/traces'.
         """
         super().__init__()
         w = str(weights[0] if isinstance(weights, list) else weights)
@@ -122,6 +175,10 @@ class AutoBackend(nn.Module):
             triton,
         ) = self._model_type(w)
         fp16 &= pt or jit or onnx or xml or engine or nn_module or triton  # FP16
+        bf16 &= (pt or nn_module) and device.type == "cpu" and not fp16  # bfloat16 autocast, PyTorch on CPU only
+        if bf16 and not cpu_supports_bf16():
+            LOGGER.warning("WARNING ⚠️ bf16=True needs a CPU with native bfloat16 (AVX512-BF16 or AMX), using FP32")
+            bf16 = False
         nhwc = coreml or saved_model or pb or tflite or edgetpu  # BHWC formats (vs torch BCWH)
         stride = 32  # default stride
         model, metadata = None, None
@@ -145,6 +202,8 @@ class AutoBackend(nn.Module):
             stride = max(int(model.stride.max()), 32)  # model stride
             names = model.module.names if hasattr(model, "module") else model.names  # get class names
             model.half() if fp16 else model.float()
+            if bf16:
+                model.to(memory_format=torch.channels_last)  # weights stay FP32, autocast casts them per op
             self.model = model  # explicitly assign for to(), cpu(), cuda(), half()
             pt = True
 
@@ -159,6 +218,8 @@ class AutoBackend(nn.Module):
             stride = max(int(model.stride.max()), 32)  # model stride
             names = model.module.names if hasattr(model, "module") else model.names  # get class names
             model.half() if fp16 else model.float()
+            if bf16:
+                model.to(memory_format=torch.channels_last)  # weights stay FP32, autocast casts them per op
             self.model = model  # explicitly assign for to(), cpu(), cuda(), half()
 
         # TorchScript
@@ -395,6 +456,10 @@ class AutoBackend(nn.Module):
                 p.requires_grad = False
 
         self.__dict__.update(locals())  # assign all variables to self
+        self.trace &= bool(pt)  # only PyTorch models can be traced
+        self.traces, self.trace_id = {}, None
+        if xml:
+            self.ov_local = threading.local()  # per-thread infer requests, see ov_request()
 
     def forward(self, im, augment=False, visualize=False, embed=None):
         """
@@ -417,7 +482,16 @@ class AutoBackend(nn.Module):
 
         # PyTorch
         if self.pt or self.nn_module:
-            y = self.model(im, augment=augment, visualize=visualize, embed=embed)
+            if self.bf16:
+                im = im.contiguous(memory_format=torch.channels_last)
+            # cache_enabled=False so traces record the casts; weights do not require grad, so nothing is cached anyway
+            with torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.bf16, cache_enabled=False):
+                if self.trace and not (augment or visualize or embed):
+                    y = self.traced_forward(im)
+                else:
+                    y = self.model(im, augment=augment, visualize=visualize, embed=embed)
+            if self.bf16:
+                y = float_outputs(y)
 
         # TorchScript
         elif self.jit:
@@ -456,7 +530,7 @@ class AutoBackend(nn.Module):
                 y = np.concatenate([list(r.values())[0] for r in results])
 
             else:  # inference_mode = "LATENCY", optimized for fastest first result at batch-size 1
-                y = list(self.ov_compiled_model(im).values())
+                y = list(self.ov_request().infer({self.input_name: im}).values())
 
         # TensorRT
         elif self.engine:
@@ -572,13 +646,87 @@ class AutoBackend(nn.Module):
         """
         return torch.tensor(x).to(self.device) if isinstance(x, np.ndarray) else x
 
+    def ov_request(self):
+        """OpenVINO infer request of the calling thread; calling the compiled model directly shares one request."""
+        request = getattr(self.ov_local, "request", None)
+        if request is None:
+            request = self.ov_local.request = self.ov_compiled_model.create_infer_request()
+        return request
+
+    def trace_file(self, shape, dtype):
+        """
+        Path the trace for input `shape` (b, c, h, w) and `dtype` is saved to, '*' sides give a glob pattern.
+
+        Traces are saved to `trace_dir` under the model's fingerprint (see model_fingerprint()), input shape, dtype,
+        bf16 autocast, device and torch version, so restarted processes and other workers load them instead of tracing
+        again.
+        """
+        if self.trace_id is None:
+            self.trace_id = model_fingerprint(self.model)
+        dtype = str(dtype).split(".")[-1] + ("_bf16" if self.bf16 else "")
+        return Path(self.trace_dir or USER_CONFIG_DIR / "traces") / (
+            f"{self.trace_id}_{'x'.join(map(str, shape))}_{dtype}_"
+            f"{self.device.type}_torch{torch.__version__.split('+')[0]}.torchscript"
+        )
+
+    def traced_forward(self, im):
+        """
+        Run `im` through the frozen TorchScript trace for its height, width and dtype.
+
+        A trace has a fixed batch size, so batches smaller than the configured `batch`, or than the batch the trace
+        for this shape was made with, are zero-padded up to it and the padding is dropped from the outputs. The last,
+        partial batch of a document then reuses the trace of the full batches instead of tracing another shape.
+        """
+        b = im.shape[0]
+        bs = max(b, self.batch, self.traces.get((*im.shape[2:], im.dtype), (0, None))[0])
+        if b < bs:
+            im = torch.cat([im, im.new_zeros((bs - b, *im.shape[1:]))])
+        y = self.traced_model(im)(im)
+        return first_outputs(y, b) if b < bs else y
+
+    def traced_model(self, im):
+        """
+        Return the frozen TorchScript trace of the PyTorch model for the height, width and dtype of `im`.
+
+        Keep the number of input shapes small, e.g. with rect=True bucketing, since each shape is traced separately.
+        Inputs come padded from traced_forward(), so a batch larger than the existing trace's replaces it. With bf16,
+        the trace records the autocast casts and runs in bfloat16 by itself.
+        """
+        key = (*im.shape[2:], im.dtype)
+        if key not in self.traces or self.traces[key][0] < im.shape[0]:
+            f = self.trace_file(im.shape, im.dtype)
+            if f.exists():
+                model = torch.jit.load(str(f), map_location=self.device)
+            else:
+                LOGGER.info(f"Tracing model for input shape {tuple(im.shape)} to {f}...")
+                with torch.no_grad():
+                    model = torch.jit.freeze(torch.jit.trace(self.model.eval(), im, strict=False, check_trace=False))
+                f.parent.mkdir(parents=True, exist_ok=True)
+                tmp = f.with_suffix(f".{os.getpid()}.tmp")  # atomic, workers may trace the same shape concurrently
+                torch.jit.save(model, str(tmp))
+                os.replace(tmp, f)
+            self.traces[key] = (im.shape[0], model)
+        return self.traces[key][1]
+
     def warmup(self, imgsz=(1, 3, 640, 640)):
         """
         Warm up the model by running one forward pass with a dummy input.
 
+        Traced models instead load and run the traces saved by earlier runs, i.e. the rect buckets pages actually
+        used, rather than tracing a dummy shape that inference may never see.
+
         Args:
             imgsz (tuple): The shape of the dummy input tensor in the format (batch_size, channels, height, width)
         """
+        if self.trace:
+            dtype = torch.half if self.fp16 else torch.float
+            saved = self.trace_file((self.batch, imgsz[1], "*", "*"), dtype)
+            for f in sorted(saved.parent.glob(saved.name)):
+                h, w = map(int, re.match(rf"{self.trace_id}_{self.batch}x{imgsz[1]}x(\d+)x(\d+)_", f.name).groups())
+                im = torch.zeros(self.batch, imgsz[1], h, w, dtype=dtype, device=self.device)
+                for _ in range(2):  # the TorchScript profiling executor optimizes the graph on the second run
+                    self.forward(im)
+            return
         warmup_types = self.pt, self.jit, self.onnx, self.engine, self.saved_model, self.pb, self.triton, self.nn_module
         if any(warmup_types) and (self.device.type != "cpu" or self.triton):
             im = torch.empty(*imgsz, dtype=torch.half if self.fp16 else torch.float, device=self.device)  # input
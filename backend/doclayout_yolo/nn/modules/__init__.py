@@ -17,7 +17,7 @@ Example:
     ```
 """
 
-from .g2l_crm import G2L_CRM
+from .g2l_crm import G2L_CRM, DilatedBlock
 from .block import (
     C1,
     C2,
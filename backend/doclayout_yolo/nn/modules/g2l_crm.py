@@ -4,6 +4,7 @@ from typing import Any, Callable, List, Optional, Tuple
 
 from .conv import Conv
 from .block import CIB
+from doclayout_yolo.utils.torch_utils import fuse_conv_and_bn
 
 import torch
 from torch import nn, Tensor
@@ -33,9 +34,11 @@ class DilatedBlock(nn.Module):
 
     def dilated_conv(self, x, dilation):
         act = self.dcv.act
-        bn = self.dcv.bn
         weight = self.dcv.conv.weight
         padding = dilation * (self.k//2)
+        if not hasattr(self.dcv, "bn"):  # BatchNorm folded into the kernel by fuse_convs()
+            return act(F.conv2d(x, weight, self.dcv.conv.bias, stride=1, padding=padding, dilation=dilation))
+        bn = self.dcv.bn
         return act(bn(F.conv2d(x, weight, stride=1, padding=padding, dilation=dilation)))
     
     def forward(self, x):
@@ -54,6 +57,31 @@ class DilatedBlock(nn.Module):
             dx = self.conv1x1(dx)
             
         return x + dx if self.add else dx
+
+    def forward_fuse(self, x):
+        """Inference forward after fuse_convs(), summing the branches as they are computed instead of stacking them."""
+        if self.fuse == "glu":
+            return self.forward(x)
+        dx = None
+        for d in self.dilation:
+            _dx = self.cv2(self.dilated_conv(x, d))
+            dx = _dx if dx is None else dx.add_(_dx)
+        if self.fuse == "sum":
+            dx = self.conv1x1(dx)
+        return x + dx if self.add else dx
+
+    def fuse_convs(self):
+        """
+        Fold the BatchNorm of the shared dilated kernel into its weight and bias.
+
+        All dilation rates share one kernel and one BatchNorm, so a single fused weight and bias serves every branch.
+        This has to happen here rather than in the generic Conv fusion, which would replace `dcv.conv` with a
+        dilation-1 layer whose forward the branches never call.
+        """
+        if hasattr(self.dcv, "bn"):
+            self.dcv.conv = fuse_conv_and_bn(self.dcv.conv, self.dcv.bn)
+            delattr(self.dcv, "bn")
+            self.dcv.forward = self.dcv.forward_fuse
         
 
 class DilatedBottleneck(nn.Module):
@@ -45,9 +45,13 @@ class Detect(nn.Module):
         # Inference path
         shape = x[0].shape  # BCHW
         x_cat = torch.cat([xi.view(shape[0], self.no, -1) for xi in x], 2)
-        if self.dynamic or self.shape != shape:
-            self.anchors, self.strides = (x.transpose(0, 1) for x in make_anchors(x, self.stride, 0.5))
-            self.shape = shape
+        # Read (shape, anchors, strides) once, so concurrent calls with other input shapes cannot mix them
+        cache = getattr(self, "anchor_cache", None)
+        if self.dynamic or cache is None or cache[0] != shape:
+            cache = (shape, *(x.transpose(0, 1) for x in make_anchors(x, self.stride, 0.5)))
+            self.anchor_cache = cache
+            self.shape, self.anchors, self.strides = cache
+        _, anchors, strides = cache
 
         if self.export and self.format in ("saved_model", "pb", "tflite", "edgetpu", "tfjs"):  # avoid TF FlexSplitV ops
             box = x_cat[:, : self.reg_max * 4]
@@ -61,10 +65,10 @@ class Detect(nn.Module):
             grid_h = shape[2]
             grid_w = shape[3]
             grid_size = torch.tensor([grid_w, grid_h, grid_w, grid_h], device=box.device).reshape(1, 4, 1)
-            norm = self.strides / (self.stride[0] * grid_size)
-            dbox = self.decode_bboxes(self.dfl(box) * norm, self.anchors.unsqueeze(0) * norm[:, :2])
+            norm = strides / (self.stride[0] * grid_size)
+            dbox = self.decode_bboxes(self.dfl(box) * norm, anchors.unsqueeze(0) * norm[:, :2])
         else:
-            dbox = self.decode_bboxes(self.dfl(box), self.anchors.unsqueeze(0)) * self.strides
+            dbox = self.decode_bboxes(self.dfl(box), anchors.unsqueeze(0)) * strides
 
         y = torch.cat((dbox, cls.sigmoid()), 1)
         return y if self.export else (y, x)
@@ -496,6 +500,7 @@ class RTDETRDecoder(nn.Module):
 class v10Detect(Detect):
 
     max_det = -1
+    one2one_only = False  # inference mode that skips the one2many branch, enabled by the predictor
 
     def __init__(self, nc=80, ch=()):
         super().__init__(nc, ch)
@@ -509,19 +514,18 @@ class v10Detect(Detect):
     
     def forward(self, x):
         one2one = self.forward_feat([xi.detach() for xi in x], self.one2one_cv2, self.one2one_cv3)
-        if not self.export:
-            one2many = super().forward(x)
+        if self.training:
+            assert self.cv2 is not None, "one2many head was stripped for deployment, the model cannot be trained"
+            return {"one2many": super().forward(x), "one2one": one2one}
 
-        if not self.training:
-            one2one = self.inference(one2one)
-            if not self.export:
-                return {"one2many": one2many, "one2one": one2one}
-            else:
-                assert(self.max_det != -1)
-                boxes, scores, labels = ops.v10postprocess(one2one.permute(0, 2, 1), self.max_det, self.nc)
-                return torch.cat([boxes, scores.unsqueeze(-1), labels.unsqueeze(-1)], dim=-1)
-        else:
-            return {"one2many": one2many, "one2one": one2one}
+        one2one = self.inference(one2one)
+        if self.export:
+            assert(self.max_det != -1)
+            boxes, scores, labels = ops.v10postprocess(one2one.permute(0, 2, 1), self.max_det, self.nc)
+            return torch.cat([boxes, scores.unsqueeze(-1), labels.unsqueeze(-1)], dim=-1)
+        if self.one2one_only or self.cv2 is None:  # predictions only ever use the one2one branch
+            return {"one2one": one2one}
+        return {"one2many": super().forward(x), "one2one": one2one}
 
     def bias_init(self):
         super().bias_init()
@@ -1,6 +1,7 @@
 # Ultralytics YOLO 🚀, AGPL-3.0 license
 
 import contextlib
+import zipfile
 from copy import deepcopy
 from pathlib import Path
 
@@ -55,12 +56,14 @@ from doclayout_yolo.nn.modules import (
     RepVGGDW,
     v10Detect,
     G2L_CRM,
+    DilatedBlock,
 )
-from doclayout_yolo.utils import DEFAULT_CFG_DICT, DEFAULT_CFG_KEYS, LOGGER, colorstr, emojis, yaml_load
+from doclayout_yolo.utils import DEFAULT_CFG_DICT, DEFAULT_CFG_KEYS, LOGGER, WEIGHTS_MMAP, colorstr, emojis, yaml_load
 from doclayout_yolo.utils.checks import check_requirements, check_suffix, check_yaml
 from doclayout_yolo.utils.loss import v8ClassificationLoss, v8DetectionLoss, v8OBBLoss, v8PoseLoss, v8SegmentationLoss, v10DetectLoss
 from doclayout_yolo.utils.plotting import feature_visualization
 from doclayout_yolo.utils.torch_utils import (
+    TORCH_2_1,
     fuse_conv_and_bn,
     fuse_deconv_and_bn,
     initialize_weights,
@@ -203,6 +206,9 @@ class BaseModel(nn.Module):
                 if isinstance(m, RepVGGDW):
                     m.fuse()
                     m.forward = m.forward_fuse
+                if isinstance(m, DilatedBlock):  # before modules() reaches its dcv Conv
+                    m.fuse_convs()
+                    m.forward = m.forward_fuse
             self.info(verbose=verbose)
 
         return self
@@ -247,6 +253,7 @@ class BaseModel(nn.Module):
             m.stride = fn(m.stride)
             m.anchors = fn(m.anchors)
             m.strides = fn(m.strides)
+            m.anchor_cache = None  # rebuilt on the new device
         return self
 
     def load(self, weights, verbose=True):
@@ -706,7 +713,7 @@ def temporary_modules(modules=None):
                 del sys.modules[old]
 
 
-def torch_safe_load(weight):
+def torch_safe_load(weight, mmap=None):
     """
     This function attempts to load a PyTorch model with the torch.load() function. If a ModuleNotFoundError is raised,
     it catches the error, logs a warning message, and attempts to install the missing module via the
@@ -714,6 +721,9 @@ def torch_safe_load(weight):
 
     Args:
         weight (str): The file path of the PyTorch model.
+        mmap (bool, optional): Memory-map the tensors instead of reading them into private memory, so processes
+            loading the same file share its page cache. Needs torch>=2.1 and a zipfile checkpoint, and only saves
+            memory for FP32 weights that are not converted after loading. Defaults to YOLO_WEIGHTS_MMAP.
 
     Returns:
         (dict): The loaded PyTorch model.
@@ -722,6 +732,10 @@ def torch_safe_load(weight):
 
     check_suffix(file=weight, suffix=".pt")
     file = attempt_download_asset(weight)  # search online if missing locally
+    mmap = WEIGHTS_MMAP if mmap is None else mmap
+    if mmap and not (TORCH_2_1 and zipfile.is_zipfile(file)):
+        LOGGER.warning(f"WARNING ⚠️ Cannot memory-map {weight}, needs torch>=2.1 and a zipfile checkpoint")
+        mmap = False
     try:
         with temporary_modules(
             {
@@ -730,7 +744,7 @@ def torch_safe_load(weight):
                 "doclayout_yolo.yolo.data": "doclayout_yolo.data",
             }
         ):  # for legacy 8.0 Classify and Pose models
-            ckpt = torch.load(file, map_location="cpu", weights_only=False)
+            ckpt = torch.load(file, map_location="cpu", weights_only=False, **({"mmap": True} if mmap else {}))
 
     except ModuleNotFoundError as e:  # e.name is missing module name
         if e.name == "models":
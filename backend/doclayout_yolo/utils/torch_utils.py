@@ -28,6 +28,7 @@ except ImportError:
 TORCH_1_9 = check_version(torch.__version__, "1.9.0")
 TORCH_1_13 = check_version(torch.__version__, "1.13.0")
 TORCH_2_0 = check_version(torch.__version__, "2.0.0")
+TORCH_2_1 = check_version(torch.__version__, "2.1.0")
 TORCHVISION_0_10 = check_version(torchvision.__version__, "0.10.0")
 TORCHVISION_0_11 = check_version(torchvision.__version__, "0.11.0")
 TORCHVISION_0_13 = check_version(torchvision.__version__, "0.13.0")
@@ -67,6 +68,19 @@ def get_cpu_info():
     return string.replace("(R)", "").replace("CPU ", "").replace("@ ", "")
 
 
+def cpu_supports_bf16():
+    """
+    Return True if the CPU computes in bfloat16 natively (AVX512-BF16 or AMX, i.e. Xeon Cooper Lake, Sapphire Rapids and
+    newer), where bf16 convolutions are faster than FP32 rather than emulated.
+    """
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = next((line.split(":", 1)[1].split() for line in f if line.startswith("flags")), [])
+        return "avx512_bf16" in flags or "amx_bf16" in flags
+    except OSError:  # not Linux, ask oneDNN instead
+        return torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+
+
 def select_device(device="", batch=0, newline=False, verbose=True):
     """
     Selects the appropriate PyTorch device based on the provided arguments.
@@ -506,6 +520,52 @@ def strip_optimizer(f: Union[str, Path] = "best.pt", s: str = "") -> None:
     LOGGER.info(f"Optimizer stripped from {f},{f' saved as {s},' if s else ''} {mb:.1f}MB")
 
 
+def strip_one2many(f: Union[str, Path] = "best.pt", s: str = "") -> None:
+    """
+    Remove the one2many head weights of YOLOv10 models from 'f' for deployment, optionally save as 's'.
+
+    Only the one2one head is used for predictions, so the one2many `cv2`/`cv3` branches are dead weight at inference
+    time. A stripped model still predicts, validates and exports, but can no longer be trained.
+
+    Args:
+        f (str): file path to the model to strip. Default is 'best.pt'.
+        s (str): file path to save the stripped model to. If not provided, 'f' will be overwritten.
+
+    Returns:
+        None
+
+    Example:
+        ```python
+        from doclayout_yolo.utils.torch_utils import strip_one2many
+
+        strip_one2many('doclayout_yolo_docstructbench_imgsz1024.pt', 'doclayout_yolo_deploy.pt')
+        ```
+    """
+    from doclayout_yolo.nn.modules import v10Detect
+
+    x = torch.load(f, map_location=torch.device("cpu"), weights_only=False)
+    if "model" not in x:
+        LOGGER.info(f"Skipping {f}, not a valid Ultralytics model.")
+        return
+
+    n = 0
+    for k in "model", "ema":
+        if x.get(k) is None:
+            continue
+        for m in x[k].modules():
+            if isinstance(m, v10Detect) and m.cv2 is not None:
+                n += sum(p.numel() for p in (*m.cv2.parameters(), *m.cv3.parameters()))
+                m.cv2 = m.cv3 = None
+    if not n:
+        LOGGER.info(f"Skipping {f}, no one2many head found.")
+        return
+    for k in "optimizer", "best_fitness", "updates":  # a stripped model cannot resume training
+        x[k] = None
+    torch.save(x, s or f)
+    mb = os.path.getsize(s or f) / 1e6  # file size
+    LOGGER.info(f"one2many head ({n} parameters) stripped from {f},{f' saved as {s},' if s else ''} {mb:.1f}MB")
+
+
 def profile(input, ops, n=10, device=None):
     """
     Ultralytics speed, memory and FLOPs profiler.
@@ -0,0 +1,247 @@
+import io
+import time
+import queue
+import asyncio
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import Future
+
+import torch
+from PIL import Image
+from fastapi import FastAPI, File, Form, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from tracing import METRICS, record_predict_batch, span
+
+
+class MicroBatcher:
+    """
+    Collect requests from many clients into micro-batches for the model workers.
+
+    Each worker thread blocks for the first request, then keeps collecting until the batch holds `max_batch` requests
+    or `max_wait_ms` have passed since the first one, and runs them through `fn` together. A lone request therefore
+    waits at most `max_wait_ms`, while a busy server fills whole batches.
+
+    Args:
+        fn (callable): Takes a list of requests and returns a list of results in the same order.
+        max_batch (int): Largest number of requests per call to `fn`.
+        max_wait_ms (float): Latency window for collecting a batch.
+        workers (int): Batches run through `fn` concurrently; `fn` must be thread-safe when this is above 1.
+    """
+
+    def __init__(self, fn, max_batch=8, max_wait_ms=10, workers=1):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.batch_sizes = Counter()
+        self.max_queue_depth = 0
+        self.busy_seconds = 0.0
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, request):
+        """Queue a request and return a concurrent.futures.Future for its result."""
+        future = Future()
+        self._queue.put((request, future))
+        with self._stats_lock:
+            self.requests += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, stop = [item], False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            start = time.perf_counter()
+            try:
+                results = self.fn([request for request, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                print(f"Error running batch of {len(batch)}: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                with self._stats_lock:
+                    self.failures += len(batch)
+            with self._stats_lock:
+                self.batch_sizes[len(batch)] += 1
+                self.busy_seconds += time.perf_counter() - start
+            if stop:
+                return
+
+    def metrics(self):
+        """Return queue depth, batch size and throughput counters."""
+        with self._stats_lock:
+            batches = sum(self.batch_sizes.values())
+            processed = sum(size * n for size, n in self.batch_sizes.items())
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "requests": self.requests,
+                "failures": self.failures,
+                "batches": batches,
+                "mean_batch_size": processed / batches if batches else 0.0,
+                "batch_size_histogram": {str(size): n for size, n in sorted(self.batch_sizes.items())},
+                "busy_seconds": self.busy_seconds,
+            }
+
+    def close(self):
+        for _ in self._threads:  # one stop marker per worker
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+def detect_batch(model, requests, imgsz=1024, device="cpu", tile=0, bf16=False):
+    """
+    Run layout detection on a micro-batch of (image, conf, iou) requests.
+
+    Requests sharing thresholds go through one batched predict call; the predictor itself groups same-shape pages
+    and letterboxes each batch to a bucketed rectangle. `model` is a YOLOv10 model or a PredictorPool around one.
+    Images whose longer side exceeds `tile` pixels are detected in overlapping imgsz tiles. `bf16` runs the PyTorch
+    model under bfloat16 autocast on CPUs that support it.
+
+    Returns:
+        list: One list of {'type', 'confidence', 'bbox'} elements per request.
+    """
+    groups = {}
+    for i, (_, conf, iou) in enumerate(requests):
+        groups.setdefault((conf, iou), []).append(i)
+
+    results = [None] * len(requests)
+    for (conf, iou), indices in groups.items():
+        with span("detect", imgsz=imgsz, batch=len(indices)):
+            det_results = model.predict(
+                [requests[i][0] for i in indices],
+                imgsz=imgsz,
+                conf=conf,
+                device=device,
+                batch=len(indices),
+                rect=True,
+                tile=tile,
+                bf16=bf16,
+                compact=True,
+                dedup_iou=iou,
+                agnostic_nms=True,
+                verbose=False,
+            )
+        for i, det in zip(indices, det_results):
+            results[i] = [
+                {
+                    "type": model.names[cls],
+                    "confidence": score,
+                    "bbox": {"x1": x1, "y1": y1, "x2": x2, "y2": y2},
+                }
+                for (x1, y1, x2, y2), cls, score in zip(
+                    det["xyxy"].tolist(), det["cls"].tolist(), det["conf"].tolist()
+                )
+            ]
+    return results
+
+
+def create_app(model, max_batch=8, max_wait_ms=10, imgsz=1024, device="cpu", workers=1, threads=None, tile=0,
+               bf16=False):
+    """
+    Build the FastAPI layout service around a loaded YOLOv10 model.
+
+    With `workers` above 1, that many micro-batches run in parallel through a PredictorPool sharing the model's
+    weights, each with `threads` intra-op threads.
+
+    GET /metrics returns the batcher counters, the latency histograms of the detector spans and the METRICS counters
+    as JSON, GET /metrics/prometheus the histograms and counters in the Prometheus text format.
+    """
+    model.add_callback("on_predict_batch_end", record_predict_batch)  # shared with the predictors of a PredictorPool
+    if workers > 1:
+        from doclayout_yolo.engine.predictor import PredictorPool
+        model = PredictorPool(model, workers=workers, threads=threads, imgsz=imgsz, device=device, bf16=bf16)
+    batcher = MicroBatcher(
+        lambda requests: detect_batch(model, requests, imgsz=imgsz, device=device, tile=tile, bf16=bf16),
+        max_batch=max_batch,
+        max_wait_ms=max_wait_ms,
+        workers=workers,
+    )
+    app = FastAPI()
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.state.batcher = batcher
+
+    @app.post("/detect")
+    async def detect(file: UploadFile = File(...), conf: float = Form(0.25), iou: float = Form(0.45)):
+        image = Image.open(io.BytesIO(await file.read())).convert("RGB")
+        elements = await asyncio.wrap_future(batcher.submit((image, conf, iou)))
+        return {"width": image.width, "height": image.height, "elements": elements}
+
+    @app.get("/metrics")
+    def metrics():
+        return {**batcher.metrics(), "spans": METRICS.snapshot(), "counters": METRICS.counters()}
+
+    @app.get("/metrics/prometheus", response_class=PlainTextResponse)
+    def metrics_prometheus():
+        return METRICS.prometheus()
+
+    @app.on_event("shutdown")
+    def shutdown():
+        batcher.close()
+        if workers > 1:
+            model.close()
+
+    return app
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default=None, required=True, type=str)
+    parser.add_argument('--host', default='127.0.0.1', required=False, type=str)
+    parser.add_argument('--port', default=8001, required=False, type=int)
+    parser.add_argument('--imgsz', default=1024, required=False, type=int)
+    parser.add_argument('--tile', default=0, required=False, type=int,
+                        help="tile uploads whose longer side exceeds this many pixels, e.g. posters and drawings")
+    parser.add_argument('--bf16', action='store_true',
+                        help="bfloat16 autocast on CPUs with native bf16 (AVX512-BF16/AMX), see benchmark_bf16.py")
+    parser.add_argument('--max-batch', default=8, required=False, type=int)
+    parser.add_argument('--max-wait-ms', default=10, required=False, type=float)
+    parser.add_argument('--workers', default=1, required=False, type=int,
+                        help="concurrent micro-batches, sharing one copy of the weights")
+    parser.add_argument('--threads', default=None, required=False, type=int,
+                        help="intra-op threads per worker, defaults to an equal share of the cores")
+    args = parser.parse_args()
+
+    import uvicorn
+    from doclayout_yolo import YOLOv10
+
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    print(f"Using device: {device}")
+    model = YOLOv10(args.model)
+
+    app = create_app(model, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms, imgsz=args.imgsz, device=device,
+                     workers=args.workers, threads=args.threads, tile=args.tile, bf16=args.bf16)
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,188 @@
+import os
+import json
+import argparse
+from contextlib import contextmanager
+
+from result_cache import file_checksum
+
+# Layout of the prepared inference weights, bumped to re-prepare copies made by older versions
+INFERENCE_FORMAT = "fp32-fused"
+
+
+@contextmanager
+def export_lock(path):
+    """Serialize writers of the same weights or manifest across processes, e.g. shard workers starting together."""
+    try:
+        import fcntl
+    except ImportError:  # Windows, exports and registry updates are not expected to race there
+        yield
+        return
+    with open(path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class ModelRegistry:
+    """
+    Local store of model weights, resolved by name without network access.
+
+    `registry.json` in the store maps every model name to its weights file, its SHA-256 and the (size, mtime) the
+    file had when the checksum was last verified. Weights are hashed when they are registered and afterwards only
+    when their size or mtime change, so processes start without re-reading them. Weights that are missing are
+    downloaded from the Hugging Face Hub only when a source repo is given and downloads are not disabled.
+
+    Args:
+        root (str): Store directory, model files live in `<root>/<name>/`.
+        offline (bool, optional): Never download. Defaults to the HF_HUB_OFFLINE environment variable.
+    """
+
+    def __init__(self, root, offline=None):
+        self.root = root
+        self.offline = offline if offline is not None else os.environ.get("HF_HUB_OFFLINE", "0") not in ("", "0")
+        self.manifest_path = os.path.join(root, "registry.json")
+
+    def _read(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, "r") as f:
+            return json.load(f)
+
+    def _write(self, entries):
+        tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def _update(self, name, **fields):
+        with export_lock(f"{self.manifest_path}.lock"):
+            entries = self._read()
+            entries[name] = {**entries.get(name, {}), **fields}
+            self._write(entries)
+            return entries[name]
+
+    def register(self, name, path, sha256=None, repo=None):
+        """
+        Add weights to the store under `name`.
+
+        Args:
+            name (str): Model name.
+            path (str): Weights file, inside the store or anywhere else on disk.
+            sha256 (str, optional): Expected checksum; registration fails if the file does not match.
+            repo (str, optional): Hugging Face repo the weights came from.
+
+        Returns:
+            dict: The registry entry.
+        """
+        digest = file_checksum(path, memoize=False)
+        if sha256 is not None and digest != sha256:
+            raise ValueError(f"Checksum mismatch for {path}: expected {sha256}, got {digest}")
+        stat = os.stat(path)
+        os.makedirs(self.root, exist_ok=True)
+        return self._update(name, file=os.path.relpath(os.path.abspath(path), os.path.abspath(self.root)),
+                            sha256=digest, repo=repo, verified=[stat.st_size, stat.st_mtime])
+
+    def resolve(self, name, repo=None, filename=None, sha256=None):
+        """
+        Return the local path of verified weights, registering or downloading them on first use.
+
+        Args:
+            name (str): Model name.
+            repo (str, optional): Hugging Face repo to download from if the model is not in the store.
+            filename (str, optional): Weights file name inside the repo and the store.
+            sha256 (str, optional): Expected checksum when the model is first registered.
+
+        Returns:
+            str: Path to the weights file.
+        """
+        entry = self._read().get(name)
+        if entry is None:
+            if filename is None:
+                raise KeyError(f"Model '{name}' is not registered in {self.manifest_path}")
+            path = os.path.join(self.root, name, filename)
+            if not os.path.exists(path):
+                if repo is None or self.offline:
+                    raise FileNotFoundError(
+                        f"Model '{name}' is not in the store at {self.root} and cannot be downloaded, copy the weights "
+                        f"to {path} or run: python model_registry.py register {name} <weights.pt>"
+                    )
+                from huggingface_hub import hf_hub_download
+                hf_hub_download(repo, filename, local_dir=os.path.dirname(path))
+            entry = self.register(name, path, sha256=sha256, repo=repo)
+
+        path = os.path.join(self.root, entry["file"])
+        stat = os.stat(path)
+        if entry["verified"] != [stat.st_size, stat.st_mtime]:
+            digest = file_checksum(path, memoize=False)
+            if digest != entry["sha256"]:
+                raise ValueError(f"Checksum mismatch for {path}: expected {entry['sha256']}, got {digest}")
+            self._update(name, verified=[stat.st_size, stat.st_mtime])
+        return path
+
+    def checksum(self, name):
+        """Verified SHA-256 of a registered model, without reading the weights."""
+        return self._read()[name]["sha256"]
+
+    def inference_weights(self, name, **kwargs):
+        """
+        Return an FP32, fused, optimizer-free copy of a registered checkpoint for memory-mapped loading.
+
+        Checkpoints are usually saved in FP16 and unfused, which every process converts into its own FP32 copy and
+        then folds its BatchNorms into new convolution tensors after loading. The prepared copy is made once next to
+        the original and already holds the fused FP32 tensors the predictor runs, so when it is loaded with mmap all
+        workers share the same page-cache pages instead of holding private copies of the weights.
+
+        Args:
+            name (str): Model name.
+            **kwargs: Passed to resolve().
+
+        Returns:
+            str: Path to the prepared weights.
+        """
+        src = self.resolve(name, **kwargs)
+        dst = f"{os.path.splitext(src)[0]}.fp32.pt"
+        with export_lock(f"{dst}.lock"):
+            entry = self._read()[name]  # another process may have prepared it meanwhile
+            prepared = {"inference_source": entry["sha256"], "inference_format": INFERENCE_FORMAT}
+            if not os.path.exists(dst) or {k: entry.get(k) for k in prepared} != prepared:
+                import torch
+                from doclayout_yolo.nn.tasks import torch_safe_load
+
+                print(f"DEBUG: Preparing FP32 weights for memory-mapped loading: {dst}")
+                ckpt, _ = torch_safe_load(src, mmap=False)
+                model = (ckpt.get("ema") or ckpt["model"]).float().fuse(verbose=False).eval()
+                ckpt = {**{k: v for k, v in ckpt.items() if k not in ("ema", "optimizer", "updates")}, "model": model}
+                tmp = f"{dst}.{os.getpid()}.tmp"
+                torch.save(ckpt, tmp)
+                os.replace(tmp, dst)
+                self._update(name, **prepared)
+        return dst
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Manage the local model store.")
+    parser.add_argument('--root', default=os.path.join(os.path.dirname(__file__), "models"), type=str)
+    sub = parser.add_subparsers(dest='command', required=True)
+    register = sub.add_parser('register', help="add local weights, e.g. on a machine without network access")
+    register.add_argument('name', type=str)
+    register.add_argument('path', type=str)
+    register.add_argument('--sha256', default=None, type=str)
+    register.add_argument('--repo', default=None, type=str)
+    verify = sub.add_parser('verify', help="re-hash the weights of every registered model")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root, offline=True)
+    if args.command == 'register':
+        entry = registry.register(args.name, args.path, sha256=args.sha256, repo=args.repo)
+        print(f"Registered {args.name}: {entry['file']} sha256={entry['sha256']}")
+    else:
+        failed = 0
+        for name, entry in registry._read().items():
+            path = os.path.join(args.root, entry["file"])
+            ok = os.path.exists(path) and file_checksum(path, memoize=False) == entry["sha256"]
+            failed += not ok
+            print(f"{name}: {'ok' if ok else 'FAILED'} ({path})")
+        raise SystemExit(1 if failed else 0)
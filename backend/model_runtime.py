@@ -0,0 +1,159 @@
+import os
+import json
+import importlib.util
+
+import numpy as np
+from PIL import Image
+
+from model_registry import export_lock
+from result_cache import file_checksum
+
+# Fastest first; 'auto' picks the first one that is installed
+RUNTIMES = ["openvino", "onnx", "torch"]
+RUNTIME_PACKAGES = {"openvino": "openvino", "onnx": "onnxruntime", "openvino_int8": "openvino"}
+
+# Parity tolerances against the PyTorch model on the same images
+PARITY_MIN_IOU = 0.9
+PARITY_MAX_CONF_DELTA = 0.05
+PARITY_MIN_MATCH_RATE = 0.95
+
+
+def available_runtimes():
+    """Runtimes whose packages are installed, fastest first."""
+    return [r for r in RUNTIMES if r == "torch" or importlib.util.find_spec(RUNTIME_PACKAGES[r]) is not None]
+
+
+def box_iou(a, b):
+    """IoU matrix between (N, 4) and (M, 4) xyxy boxes."""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(-1)
+    area_a = (a[:, 2:] - a[:, :2]).prod(-1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(-1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def compare_detections(reference, candidate):
+    """
+    Match compact detections of one image between two models.
+
+    A reference box is matched by the same-class candidate box with the highest IoU, if that IoU is at least
+    PARITY_MIN_IOU and the confidences differ by at most PARITY_MAX_CONF_DELTA.
+
+    Returns:
+        tuple: (matched, total, max_conf_delta) over the reference boxes.
+    """
+    matched, max_delta = 0, 0.0
+    if len(reference) and len(candidate):
+        iou = box_iou(reference["xyxy"], candidate["xyxy"])
+        iou[reference["cls"][:, None] != candidate["cls"][None, :]] = 0
+        best = iou.argmax(1)
+        deltas = np.abs(reference["conf"] - candidate["conf"][best])
+        ok = (iou[np.arange(len(reference)), best] >= PARITY_MIN_IOU) & (deltas <= PARITY_MAX_CONF_DELTA)
+        matched = int(ok.sum())
+        max_delta = float(deltas.max())
+    return matched, len(reference), max_delta
+
+
+def parity_check(reference, candidate, images, imgsz=1024, conf=0.25):
+    """
+    Compare an exported model against the PyTorch model it came from.
+
+    Args:
+        reference (YOLOv10): PyTorch model.
+        candidate (YOLOv10): Exported model.
+        images (list): Image paths to compare on.
+        imgsz (int): Inference size.
+        conf (float): Confidence threshold.
+
+    Returns:
+        dict: Match counts, match rate, largest confidence difference and whether parity holds.
+    """
+    matched = total = 0
+    max_delta = 0.0
+    for path in images:
+        image = Image.open(path).convert("RGB")
+        kwargs = dict(imgsz=imgsz, conf=conf, device="cpu", rect=True, compact=True, verbose=False)
+        ref = reference.predict(image, **kwargs)[0]
+        cand = candidate.predict(image, **kwargs)[0]
+        m, t, d = compare_detections(ref, cand)
+        matched, total, max_delta = matched + m, total + t, max(max_delta, d)
+    match_rate = matched / total if total else 1.0
+    return {
+        "images": len(images),
+        "matched": matched,
+        "total": total,
+        "match_rate": match_rate,
+        "max_conf_delta": max_delta,
+        "passed": match_rate >= PARITY_MIN_MATCH_RATE,
+    }
+
+
+def export_path(weights, runtime):
+    """Where the exported artifact of `weights` for `runtime` is cached, next to the weights."""
+    stem, _ = os.path.splitext(weights)
+    if runtime == "onnx":
+        return f"{stem}.onnx"
+    return f"{stem}_int8_openvino_model" if runtime == "openvino_int8" else f"{stem}_openvino_model"
+
+
+def load_layout_model(weights, runtime="auto", imgsz=1024, parity_images=(), checksum=None):
+    """
+    Load the layout model for CPU inference through the fastest available runtime.
+
+    The PyTorch checkpoint is exported to ONNX or OpenVINO on first use and cached next to the weights, together
+    with a `<artifact>.json` record of the weights checksum, image size and parity check result. The artifact is
+    re-exported when the weights change, and the PyTorch model is used when the export fails or does not match it.
+
+    Args:
+        weights (str): Path to the .pt checkpoint.
+        runtime (str): 'torch', 'onnx', 'openvino', or 'auto' to pick the fastest installed runtime. 'openvino_int8'
+            loads the INT8 model made by quantize.py, if its accuracy report passed.
+        imgsz (int): Inference size the artifact is exported for.
+        parity_images (list): Images for the accuracy parity check against PyTorch, run once per export.
+        checksum (str, optional): Known SHA-256 identifying the weights, e.g. from the model registry, to skip
+            hashing them.
+
+    Returns:
+        tuple: (model, runtime) where runtime is the one actually in use.
+    """
+    from doclayout_yolo import YOLOv10
+
+    torch_model = None  # only loaded to export, or as the fallback
+    runtimes = available_runtimes() if runtime == "auto" else [runtime]
+    for rt in runtimes:
+        if rt == "torch":
+            break
+        if rt not in RUNTIME_PACKAGES:
+            raise ValueError(f"Unknown runtime '{rt}', choose from {['auto', *RUNTIMES, 'openvino_int8']}")
+        artifact = export_path(weights, rt)
+        meta_file = f"{artifact}.json"
+        expected = {"weights_sha256": checksum or file_checksum(weights), "imgsz": imgsz}
+        try:
+            with export_lock(f"{artifact}.lock"):
+                meta = {}
+                if os.path.exists(meta_file):
+                    with open(meta_file, "r") as f:
+                        meta = json.load(f)
+                if {k: meta.get(k) for k in expected} != expected or not os.path.exists(artifact):
+                    if rt == "openvino_int8":  # calibration needs document pages and a labelled set
+                        raise FileNotFoundError(f"no INT8 model for these weights, run quantize.py to create {artifact}")
+                    print(f"DEBUG: Exporting {weights} to {rt}")
+                    if torch_model is None:
+                        torch_model = YOLOv10(weights)
+                    torch_model.export(format="openvino" if rt == "openvino" else "onnx", imgsz=imgsz, dynamic=True)
+                    model = YOLOv10(artifact, task="detect")
+                    meta = {**expected, "parity": parity_check(torch_model, model, list(parity_images), imgsz)}
+                    with open(meta_file, "w") as f:
+                        json.dump(meta, f, indent=2)
+                    print(f"DEBUG: {rt} parity check: {meta['parity']}")
+                else:
+                    model = YOLOv10(artifact, task="detect")
+            if not meta["parity"]["passed"]:
+                print(f"Warning: {rt} model does not match PyTorch ({meta['parity']}), not using it")
+                continue
+            print(f"DEBUG: Using {rt} runtime from {artifact}")
+            return model, rt
+        except Exception as e:
+            print(f"Warning: Could not use the {rt} runtime: {str(e)}")
+    return (torch_model if torch_model is not None else YOLOv10(weights)), "torch"
@@ -0,0 +1,125 @@
+import queue
+import threading
+
+_DONE = object()  # end-of-stream marker passed between stages
+
+
+def run_pipeline(source, stages, queue_size=2):
+    """
+    Run a chain of stages concurrently and yield results in source order as soon as each item is done.
+
+    The source is consumed in its own thread and every stage runs in its own worker threads, connected by bounded
+    queues so a fast stage cannot run more than `queue_size` items ahead of a slow one. Stages that release the GIL
+    (PDF rendering, model inference, Tesseract/EasyOCR) therefore overlap across pages.
+
+    Args:
+        source (iterable): Items fed to the first stage, e.g. rendered pages.
+        stages (list): (function, workers) or (function, workers, batch_size) tuples. Each function takes the
+            previous stage's output and returns its own; returning None drops the item from the later stages. Use
+            workers=1 for stages that are not thread-safe. Batched stages take and return lists instead: a worker
+            takes whatever is already queued, up to batch_size items, so batching never waits for more input.
+        queue_size (int): Capacity of each queue between stages.
+
+    Yields:
+        The last stage's output for every item that made it through, in source order.
+    """
+    stop = threading.Event()
+    stages = [(stage[0], stage[1], stage[2] if len(stage) > 2 else None) for stage in stages]
+    # A batched stage can only collect as many items as its input queue holds
+    queues = [queue.Queue(maxsize=max(queue_size, batch_size or 1)) for _, _, batch_size in stages]
+    queues.append(queue.Queue(maxsize=queue_size))
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def feed():
+        try:
+            for seq, item in enumerate(source):
+                if stop.is_set():
+                    break
+                put(queues[0], (seq, item))
+        except Exception as e:
+            print(f"Error reading pipeline source: {str(e)}")
+        finally:
+            put(queues[0], _DONE)
+
+    def finish(q_in, q_out, remaining):
+        put(q_in, _DONE)  # let sibling workers see the marker too
+        with remaining[1]:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                put(q_out, _DONE)
+
+    def work(fn, q_in, q_out, remaining, batch_size):
+        while not stop.is_set():
+            try:
+                item = q_in.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                finish(q_in, q_out, remaining)
+                return
+
+            batch, done = [item], False
+            while batch_size and len(batch) < batch_size:
+                try:
+                    item = q_in.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+
+            live = [(seq, value) for seq, value in batch if value is not None]
+            outputs = {}
+            if live:
+                try:
+                    if batch_size:
+                        values = fn([value for _, value in live])
+                    else:
+                        values = [fn(live[0][1])]
+                    outputs = {seq: value for (seq, _), value in zip(live, values)}
+                except Exception as e:
+                    print(f"Error in pipeline stage {getattr(fn, '__name__', fn)}: {str(e)}")
+            for seq, _ in batch:
+                put(q_out, (seq, outputs.get(seq)))
+            if done:
+                finish(q_in, q_out, remaining)
+                return
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    for i, (fn, workers, batch_size) in enumerate(stages):
+        remaining = [max(1, workers), threading.Lock()]
+        for _ in range(remaining[0]):
+            threads.append(
+                threading.Thread(
+                    target=work, args=(fn, queues[i], queues[i + 1], remaining, batch_size), daemon=True
+                )
+            )
+    for t in threads:
+        t.start()
+
+    # Multi-worker stages may finish out of order, so hold results until their predecessors are out
+    pending, next_seq = {}, 0
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                break
+            seq, value = item
+            pending[seq] = value
+            while next_seq in pending:
+                value = pending.pop(next_seq)
+                next_seq += 1
+                if value is not None:
+                    yield value
+    finally:
+        stop.set()
+        for t in threads:
+            t.join(timeout=1)
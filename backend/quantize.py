@@ -0,0 +1,204 @@
+import os
+import glob
+import json
+import shutil
+import argparse
+
+import numpy as np
+from PIL import Image
+
+from batch import expand_inputs
+from model_registry import ModelRegistry
+from model_runtime import export_path, load_layout_model
+from result_cache import file_checksum
+
+DEFAULT_STORE = os.environ.get("PDF_MODEL_STORE", os.path.join(os.path.dirname(__file__), "models"))
+# Calibration and benchmark sources: PDFs, rendered page by page, and page images
+PAGE_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png")
+
+
+def pdf_pages(pdf_path, imgsz):
+    """Yield the pages of a PDF rendered at the detector input size."""
+    from rasterizer import get_rasterizer
+
+    with get_rasterizer(pdf_path, max_side=imgsz) as rasterizer:
+        for _, page in rasterizer.iter_pages():
+            if page is not None:
+                yield page
+
+
+def calibration_pages(sources, limit, imgsz):
+    """
+    Collect up to `limit` calibration pages from PDFs and page images.
+
+    Pages are taken round-robin across the sources, so every document contributes before any contributes twice and
+    the activation ranges cover the variety of layouts rather than the first long document.
+    """
+    iterators = [pdf_pages(p, imgsz) if p.lower().endswith(".pdf") else iter([Image.open(p)]) for p in sources]
+    pages = []
+    while iterators and len(pages) < limit:
+        for it in list(iterators):
+            page = next(it, None)
+            if page is None:
+                iterators.remove(it)
+                continue
+            pages.append(page.convert("RGB"))
+            if len(pages) == limit:
+                break
+    return pages
+
+
+def calibration_input(page, imgsz, rect_step=128, stride=32):
+    """
+    Letterbox a page the way the predictor does for exported models and return a (1, 3, h, w) float32 input.
+
+    With rectangular inference (rect_step > 0) pages are padded to the same `rect_step` buckets the app runs the
+    INT8 model on, so activation ranges are calibrated on the padding the deployed model actually sees; with
+    rect_step=0 they are (imgsz, imgsz) squares.
+    """
+    from doclayout_yolo.data.augment import LetterBox
+    from doclayout_yolo.engine.predictor import rect_shape
+
+    im = np.asarray(page)
+    shape = rect_shape(im.shape[:2], (imgsz, imgsz), rect_step, stride) if rect_step else (imgsz, imgsz)
+    im = LetterBox(shape, auto=False, stride=stride)(image=im)
+    return np.ascontiguousarray(im.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def quantization_target(model, store=DEFAULT_STORE, checksum=None):
+    """
+    Return the weights to quantize and the checksum the runtime loader identifies them by.
+
+    A registered model name resolves the way the app loads it: to the registry's FP32 inference copy, identified by
+    the checksum of the registered weights. The INT8 model then lands where PDF_LAYOUT_RUNTIME=openvino_int8 looks for
+    it. A weights path is used as is, identified by `checksum` or else by its own hash.
+    """
+    if os.path.isfile(model):
+        return model, checksum or file_checksum(model)
+    registry = ModelRegistry(store)
+    return registry.inference_weights(model), checksum or registry.checksum(model)
+
+
+def save_int8_report(weights, checksum, imgsz, report):
+    """Write the INT8 model's sidecar in the runtime loader's format, so openvino_int8 only loads a passing model."""
+    meta_file = f"{export_path(weights, 'openvino_int8')}.json"
+    with open(meta_file, "w") as f:
+        json.dump({"weights_sha256": checksum, "imgsz": imgsz, "parity": report}, f, indent=2)
+    return meta_file
+
+
+def evaluate(model_path, data, imgsz, **kwargs):
+    """Validate a model on a labelled dataset and return its overall and per-class mAP and latency."""
+    from doclayout_yolo import YOLOv10
+
+    metrics = YOLOv10(model_path, task="detect").val(data=data, imgsz=imgsz, batch=1, device="cpu", plots=False,
+                                                     **kwargs)
+    return {
+        "map50": float(metrics.box.map50),
+        "map50_95": float(metrics.box.map),
+        "inference_ms": float(metrics.speed["inference"]),
+        "per_class": {metrics.names[int(c)]: float(metrics.box.class_result(i)[3])
+                      for i, c in enumerate(metrics.box.ap_class_index)},
+    }
+
+
+def accuracy_report(reference, candidate, max_map_drop, labels=("fp32", "int8")):
+    """
+    Compare the evaluate() results of a reduced-precision model against its reference.
+
+    The candidate passes if mAP50-95 drops by at most `max_map_drop`, overall and for every class.
+    """
+    ref, cand = labels
+    per_class = {}
+    for name, ap in reference["per_class"].items():
+        other = candidate["per_class"].get(name, 0.0)
+        per_class[name] = {ref: ap, cand: other, "delta": other - ap}
+    map_delta = candidate["map50_95"] - reference["map50_95"]
+    worst_class = min((c["delta"] for c in per_class.values()), default=0.0)
+    return {
+        ref: {k: v for k, v in reference.items() if k != "per_class"},
+        cand: {k: v for k, v in candidate.items() if k != "per_class"},
+        "map50_95_delta": map_delta,
+        "speedup": reference["inference_ms"] / candidate["inference_ms"] if candidate["inference_ms"] else None,
+        "per_class": per_class,
+        "passed": map_delta >= -max_map_drop and worst_class >= -max_map_drop,
+    }
+
+
+def print_accuracy_report(report, max_map_drop, labels=("fp32", "int8")):
+    """Print the per-class table, speed and recommendation of an accuracy_report()."""
+    ref, cand = labels
+    print(f"\n{'class':<20}{ref.upper():>10}{cand.upper():>10}{'delta':>10}")
+    for name, c in report["per_class"].items():
+        print(f"{name:<20}{c[ref]:>10.4f}{c[cand]:>10.4f}{c['delta']:>+10.4f}")
+    print(f"{'all':<20}{report[ref]['map50_95']:>10.4f}{report[cand]['map50_95']:>10.4f}"
+          f"{report['map50_95_delta']:>+10.4f}")
+    print(f"\nInference: {ref.upper()} {report[ref]['inference_ms']:.1f}ms, {cand.upper()} "
+          f"{report[cand]['inference_ms']:.1f}ms per page, {report['speedup'] or 0:.2f}x speedup")
+    print(f"Recommendation: {'deploy' if report['passed'] else 'keep ' + ref.upper()} "
+          f"(max allowed mAP50-95 drop {max_map_drop})")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="INT8 post-training quantization of the layout model for CPU.")
+    parser.add_argument('--model', default=None, required=True, type=str,
+                        help="registered model name, e.g. DocLayout-YOLO-DocStructBench as the app loads it, or a "
+                             "weights path")
+    parser.add_argument('--store', default=DEFAULT_STORE, required=False, type=str,
+                        help="model store that --model names are resolved in")
+    parser.add_argument('--checksum', default=None, required=False, type=str,
+                        help="SHA-256 the app identifies the weights by, if it differs from the hash of --model")
+    parser.add_argument('--calib', nargs='+', required=True, type=str,
+                        help="PDFs, page images, directories or glob patterns to calibrate on")
+    parser.add_argument('--data', default=None, required=True, type=str,
+                        help="labelled dataset yaml the FP32 and INT8 models are compared on")
+    parser.add_argument('--imgsz', default=1024, required=False, type=int)
+    parser.add_argument('--rect-step', default=128, required=False, type=int,
+                        help="RECT_STEP buckets the app letterboxes pages to, 0 if it runs with PDF_RECT_INFERENCE=0")
+    parser.add_argument('--subset-size', default=300, required=False, type=int)
+    parser.add_argument('--max-map-drop', default=0.01, required=False, type=float,
+                        help="largest mAP50-95 drop, overall and per class, to still recommend the INT8 model")
+    args = parser.parse_args()
+
+    import nncf
+    import openvino as ov
+    from doclayout_yolo import YOLOv10
+    from doclayout_yolo.engine.exporter import int8_ignored_scope
+
+    weights, checksum = quantization_target(args.model, args.store, args.checksum)
+
+    sources = expand_inputs(args.calib, PAGE_EXTENSIONS)
+    pages = calibration_pages(sources, args.subset_size, args.imgsz)
+    print(f"Calibrating on {len(pages)} pages from {len(sources)} files")
+    if len(pages) < args.subset_size:
+        print(f"Warning: {args.subset_size} calibration pages requested, found {len(pages)}")
+
+    # FP32 OpenVINO model, exported and cached by the runtime loader
+    _, runtime = load_layout_model(weights, runtime="openvino", imgsz=args.imgsz, checksum=checksum)
+    if runtime != "openvino":
+        raise SystemExit("OpenVINO export failed, cannot quantize")
+    fp32_dir = export_path(weights, "openvino")
+    fp32_xml = glob.glob(os.path.join(fp32_dir, "*.xml"))[0]
+
+    int8_dir = export_path(weights, "openvino_int8")
+    os.makedirs(int8_dir, exist_ok=True)
+    ov_model = ov.Core().read_model(fp32_xml)
+    torch_model = YOLOv10(weights).model
+    stride = max(int(torch_model.stride.max()), 32)  # as AutoBackend, which the predictor letterboxes with
+    quantized = nncf.quantize(
+        ov_model,
+        nncf.Dataset(pages, lambda page: calibration_input(page, args.imgsz, args.rect_step, stride)),
+        preset=nncf.QuantizationPreset.MIXED,
+        subset_size=len(pages),
+        ignored_scope=int8_ignored_scope(torch_model),
+    )
+    ov.save_model(quantized, os.path.join(int8_dir, os.path.basename(fp32_xml)), compress_to_fp16=False)
+    shutil.copy(os.path.join(fp32_dir, "metadata.yaml"), int8_dir)  # names, stride and imgsz for AutoBackend
+    print(f"INT8 model saved to {int8_dir}")
+
+    fp32, int8 = evaluate(fp32_dir, args.data, args.imgsz), evaluate(int8_dir, args.data, args.imgsz)
+    report = {**accuracy_report(fp32, int8, args.max_map_drop), "calibration_pages": len(pages)}
+    print_accuracy_report(report, args.max_map_drop)
+
+    print(f"Report saved to {save_int8_report(weights, checksum, args.imgsz, report)}")
@@ -0,0 +1,352 @@
+import re
+import math
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+
+class PageRasterizer:
+    """
+    Base class for page rasterizers.
+
+    A rasterizer opens a PDF document once and renders its pages on demand, so the document is never re-parsed or
+    re-serialized per page. Subclasses implement `page_count` and `_render`.
+
+    Args:
+        pdf_path (str): Path to the PDF document.
+        dpi (int): Resolution used to render pages.
+        workers (int): Number of rendering workers. 1 renders in the calling process.
+        max_side (int, optional): Render every page so its longer side is this many pixels, e.g. the detector input
+            size, instead of at a fixed DPI.
+    """
+
+    name = None
+    renders_regions = True  # render_region() renders just the region, not a full page it is cut from
+
+    def __init__(self, pdf_path, dpi=300, workers=1, max_side=None):
+        self.pdf_path = pdf_path
+        self.dpi = dpi
+        self.workers = max(1, int(workers))
+        self.max_side = max_side
+
+    @property
+    def page_count(self):
+        raise NotImplementedError
+
+    def _render(self, page_indices):
+        """Yield (page_index, PIL.Image) for the given 0-based page indices, in order."""
+        raise NotImplementedError
+
+    def render_page(self, page_index):
+        """Render a single 0-based page and return it as an RGB PIL image."""
+        for _, image in self._render([page_index]):
+            return image
+        return None
+
+    def page_size(self, page_index, dpi):
+        """Return the (width, height) in pixels of a page rendered at `dpi`."""
+        raise NotImplementedError
+
+    def render_region(self, page_index, box, dpi):
+        """
+        Render only part of a page.
+
+        Args:
+            page_index (int): 0-based page index.
+            box (tuple): (x1, y1, x2, y2) in pixels of the page rendered at `dpi`.
+            dpi (int): Resolution of the region.
+
+        Returns:
+            PIL.Image: The rendered region.
+        """
+        raise NotImplementedError
+
+    def lazy_page(self, page_index, dpi):
+        """Return a LazyPage that stands in for the full page at `dpi` without rendering it."""
+        return LazyPage(self, page_index, dpi)
+
+    def iter_pages(self, page_indices=None):
+        """
+        Render pages in document order.
+
+        Args:
+            page_indices (iterable, optional): 0-based page indices to render. Defaults to all pages.
+
+        Yields:
+            tuple: (page_index, PIL.Image) for every page. The image is None if the page failed to render.
+        """
+        if page_indices is None:
+            page_indices = range(self.page_count)
+        yield from self._render(list(page_indices))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# PyMuPDF process-pool workers keep their own document handle for the lifetime of the pool
+_worker_doc = None
+
+
+def _pymupdf_worker_init(pdf_path):
+    global _worker_doc
+    import fitz
+
+    _worker_doc = fitz.open(pdf_path)
+
+
+def _pymupdf_worker_render(args):
+    page_index, dpi = args
+    pix = _worker_doc[page_index].get_pixmap(dpi=dpi, alpha=False)
+    return pix.width, pix.height, pix.samples
+
+
+class LazyPage:
+    """
+    Stand-in for a high-resolution page image that renders only the regions that get cropped.
+
+    Exposes the `size` and `crop()` subset of the PIL.Image API used by text extraction, so OCR crops come from a
+    high-DPI render of just that region while detection ran on a small raster of the whole page. With rasterizers
+    that cannot render a region by itself, the full page is rendered on the first crop() and kept for later crops of
+    the same page.
+    """
+
+    def __init__(self, rasterizer, page_index, dpi):
+        self.rasterizer = rasterizer
+        self.page_index = page_index
+        self.dpi = dpi
+        self.size = rasterizer.page_size(page_index, dpi)
+        self._image = None
+        self._lock = threading.Lock()
+
+    def crop(self, box):
+        if self.rasterizer.renders_regions:
+            return self.rasterizer.render_region(self.page_index, box, self.dpi)
+        with self._lock:
+            if self._image is None:
+                self._image = self.rasterizer.render_full_page(self.page_index, self.dpi)
+        return self._image.crop(box)
+
+
+class PyMuPDFRasterizer(PageRasterizer):
+    """Render pages in-process with PyMuPDF; with workers > 1 pages are spread over a process pool."""
+
+    name = "pymupdf"
+
+    def __init__(self, pdf_path, dpi=300, workers=1, max_side=None):
+        super().__init__(pdf_path, dpi, workers, max_side)
+        import fitz
+
+        self.doc = fitz.open(pdf_path)
+        self._pool = None
+        self._lock = threading.Lock()  # PyMuPDF documents must not be used from several threads at once
+
+    @property
+    def page_count(self):
+        return self.doc.page_count
+
+    def page_dpi(self, page_index):
+        """DPI at which a page is rendered, honouring `max_side`."""
+        if self.max_side is None:
+            return self.dpi
+        with self._lock:
+            rect = self.doc[page_index].rect
+        return 72 * self.max_side / max(rect.width, rect.height)
+
+    def page_size(self, page_index, dpi):
+        with self._lock:
+            rect = self.doc[page_index].rect
+        return round(rect.width * dpi / 72), round(rect.height * dpi / 72)
+
+    def render_region(self, page_index, box, dpi):
+        import fitz
+
+        s = 72 / dpi
+        with self._lock:
+            page = self.doc[page_index]
+            x0, y0 = page.rect.x0, page.rect.y0
+            clip = fitz.Rect(x0 + box[0] * s, y0 + box[1] * s, x0 + box[2] * s, y0 + box[3] * s)
+            pix = page.get_pixmap(dpi=dpi, clip=clip, alpha=False)
+        return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+    def _render(self, page_indices):
+        if self.workers > 1 and len(page_indices) > 1:
+            if self._pool is None:
+                # spawn, not fork: forking copies the parent's threads' locks (torch, OCR engines) in whatever state
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_pymupdf_worker_init,
+                    initargs=(self.pdf_path,),
+                )
+            # Keep a window of pages in flight, Executor.map would render the whole document ahead of the consumer
+            pending = deque()
+            for page_index in page_indices:
+                future = self._pool.submit(_pymupdf_worker_render, (page_index, self.page_dpi(page_index)))
+                pending.append((page_index, future))
+                if len(pending) >= 2 * self.workers:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+            return
+
+        for page_index in page_indices:
+            try:
+                dpi = self.page_dpi(page_index)
+                with self._lock:
+                    pix = self.doc[page_index].get_pixmap(dpi=dpi, alpha=False)
+                yield page_index, Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+            except Exception as e:
+                print(f"Error rendering page {page_index + 1} with PyMuPDF: {str(e)}")
+                yield page_index, None
+
+    @staticmethod
+    def _collect(page_index, future):
+        try:
+            width, height, samples = future.result()
+            return page_index, Image.frombytes("RGB", (width, height), samples)
+        except Exception as e:
+            print(f"Error rendering page {page_index + 1} with PyMuPDF: {str(e)}")
+            return page_index, None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        with self._lock:
+            self.doc.close()
+
+
+class Pdf2ImageRasterizer(PageRasterizer):
+    """
+    Render pages with poppler through pdf2image.
+
+    Pages are rendered straight from the source file in chunks of consecutive pages, so poppler is started once per
+    chunk instead of once per page. `workers` is passed through as pdf2image's `thread_count`. Poppler cannot render
+    a clip through pdf2image, so regions are cut from a full page render; page sizes come from pdfinfo instead.
+    """
+
+    name = "pdf2image"
+    renders_regions = False
+    chunk_size = 8  # pages per poppler invocation, bounds the number of rasters held at once
+
+    def __init__(self, pdf_path, dpi=300, workers=1, max_side=None):
+        super().__init__(pdf_path, dpi, workers, max_side)
+        from pdf2image import pdfinfo_from_path
+
+        self._page_count = int(pdfinfo_from_path(pdf_path)["Pages"])
+        self._page_sizes = None  # (width, height) in points per page, read on first use
+        self._lock = threading.Lock()
+
+    @property
+    def page_count(self):
+        return self._page_count
+
+    def _read_page_sizes(self):
+        """
+        (width, height) in points of every page from a single pdfinfo call, None where pdfinfo reports none.
+
+        pdfinfo already swaps the sides of pages rotated by 90 or 270 degrees, as the pages are rendered.
+        """
+        from pdf2image import pdfinfo_from_path
+
+        info = pdfinfo_from_path(self.pdf_path, first_page=1, last_page=self._page_count)
+        sizes = []
+        for page in range(1, self._page_count + 1):
+            size = re.match(r"([\d.]+) x ([\d.]+)", info.get(f"Page {page:4d} size", ""))
+            sizes.append((float(size.group(1)), float(size.group(2))) if size else None)
+        return sizes
+
+    def page_size(self, page_index, dpi):
+        with self._lock:
+            if self._page_sizes is None:
+                self._page_sizes = self._read_page_sizes()
+        size = self._page_sizes[page_index]
+        if size is None:
+            return self.render_full_page(page_index, dpi).size
+        # pdftocairo rounds the scaled page size up to whole pixels
+        return math.ceil(size[0] * dpi / 72), math.ceil(size[1] * dpi / 72)
+
+    def render_full_page(self, page_index, dpi):
+        """Render a whole page at `dpi`, regardless of `max_side`."""
+        from pdf2image import convert_from_path
+
+        images = convert_from_path(
+            self.pdf_path, dpi=dpi, first_page=page_index + 1, last_page=page_index + 1, use_pdftocairo=True
+        )
+        return images[0].convert("RGB")
+
+    def render_region(self, page_index, box, dpi):
+        return self.render_full_page(page_index, dpi).crop(box)
+
+    def _render(self, page_indices):
+        from pdf2image import convert_from_path
+
+        # Group consecutive indices into runs so each run is a single first_page/last_page call
+        runs = []
+        for page_index in page_indices:
+            if runs and page_index == runs[-1][-1] + 1 and len(runs[-1]) < self.chunk_size:
+                runs[-1].append(page_index)
+            else:
+                runs.append([page_index])
+
+        for run in runs:
+            try:
+                images = convert_from_path(
+                    self.pdf_path,
+                    dpi=self.dpi,
+                    first_page=run[0] + 1,
+                    last_page=run[-1] + 1,
+                    thread_count=self.workers,
+                    size=self.max_side,  # pdftocairo -scale-to, overrides dpi when set
+                    grayscale=False,
+                    use_pdftocairo=True,
+                )
+            except Exception as e:
+                print(f"Error rendering pages {run[0] + 1}-{run[-1] + 1} with pdf2image: {str(e)}")
+                images = []
+            for i, page_index in enumerate(run):
+                yield page_index, images[i].convert("RGB") if i < len(images) else None
+
+
+RASTERIZERS = {
+    PyMuPDFRasterizer.name: PyMuPDFRasterizer,
+    Pdf2ImageRasterizer.name: Pdf2ImageRasterizer,
+}
+
+
+def get_rasterizer(pdf_path, backend="auto", dpi=300, workers=1, max_side=None):
+    """
+    Open a PDF with the requested rasterizer backend.
+
+    Args:
+        pdf_path (str): Path to the PDF document.
+        backend (str): One of RASTERIZERS, or 'auto' to use PyMuPDF when installed and pdf2image otherwise.
+        dpi (int): Resolution used to render pages.
+        workers (int): Number of rendering workers.
+        max_side (int, optional): Render pages to this longer-side size in pixels instead of at `dpi`.
+
+    Returns:
+        PageRasterizer: An open rasterizer. Use it as a context manager or call close() when done.
+    """
+    if backend == "auto":
+        try:
+            import fitz  # noqa: F401
+
+            backend = PyMuPDFRasterizer.name
+        except ImportError:
+            backend = Pdf2ImageRasterizer.name
+    if backend not in RASTERIZERS:
+        raise ValueError(f"Unknown rasterizer backend '{backend}', choose from {['auto', *RASTERIZERS]}")
+    resolution = f"{max_side}px max side" if max_side else f"{dpi} DPI"
+    print(f"DEBUG: Using {backend} rasterizer with {workers} worker(s) at {resolution}")
+    return RASTERIZERS[backend](pdf_path, dpi=dpi, workers=workers, max_side=max_side)
+
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+_checksums = {}
+
+
+def file_checksum(path, memoize=True, chunk_size=1 << 20):
+    """
+    Return the SHA-256 of a file.
+
+    Args:
+        path (str): Path to the file.
+        memoize (bool): Remember the digest by (path, size, mtime) so files such as model weights are hashed once
+            per process.
+        chunk_size (int): Bytes read per iteration.
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    if memo_key in _checksums:
+        return _checksums[memo_key]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    if memoize:
+        _checksums[memo_key] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+def make_key(*parts):
+    """Combine JSON-serializable parts into a stable cache key."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of processed documents with LRU eviction.
+
+    Every entry is a directory holding `result.json` and, optionally, the page visualizations as JPEG files. The
+    modification time of `result.json` is refreshed on every hit and the least recently used entries are evicted
+    once the cache grows past `max_bytes`. The cache size is kept as a running total, counted once at startup, so
+    the entries are only listed again when a put takes the total over the cap; entries written by other processes
+    are counted from that listing on.
+
+    Args:
+        cache_dir (str): Directory the entries are stored in.
+        max_bytes (int): Size cap of the cache in bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    @staticmethod
+    def _entry_size(entry):
+        """Bytes of the files in an entry directory, 0 if it does not exist."""
+        try:
+            return sum(e.stat().st_size for e in os.scandir(entry) if e.is_file())
+        except OSError:
+            return 0
+
+    def _entries(self):
+        """List (last used, size, directory) of every complete entry."""
+        entries = []
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                entry = os.path.join(shard_dir, name)
+                result_file = os.path.join(entry, "result.json")
+                if not os.path.isfile(result_file):
+                    continue
+                entries.append((os.stat(result_file).st_mtime, self._entry_size(entry), entry))
+        return entries
+
+    def get(self, key, load_visualizations=False):
+        """
+        Look up an entry.
+
+        Args:
+            key (str): Cache key from make_key().
+            load_visualizations (bool): Decode the visualizations into arrays instead of returning the paths of their
+                JPEG files, which Gradio galleries and put() accept as they are.
+
+        Returns:
+            tuple | None: (value, visualizations) on a hit, None on a miss. Visualizations are file paths, or RGB
+                numpy arrays with `load_visualizations`.
+        """
+        entry = self._entry_dir(key)
+        result_file = os.path.join(entry, "result.json")
+        try:
+            with open(result_file, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            visualizations = [os.path.join(entry, name) for name in record["visualizations"]]
+            if not all(os.path.isfile(path) for path in visualizations):
+                raise OSError("missing visualization")
+            if load_visualizations:
+                visualizations = [np.array(Image.open(path)) for path in visualizations]
+            os.utime(result_file)  # mark as recently used
+        except (OSError, ValueError, KeyError) as e:
+            if os.path.exists(entry):
+                print(f"DEBUG: Dropping unreadable cache entry {key}: {str(e)}")
+                size = self._entry_size(entry)
+                shutil.rmtree(entry, ignore_errors=True)
+                with self._lock:
+                    self._total_bytes = max(self._total_bytes - size, 0)
+            return None
+        print(f"DEBUG: Result cache hit for {key}")
+        return record["value"], visualizations
+
+    def put(self, key, value, visualizations=()):
+        """
+        Store an entry, then evict old entries if the cache is over its size cap.
+
+        Args:
+            key (str): Cache key from make_key().
+            value (dict): JSON-serializable result.
+            visualizations (list): Optional RGB numpy arrays or JPEG file paths stored next to the result.
+        """
+        entry = self._entry_dir(key)
+        tmp = f"{entry}.tmp{os.getpid()}_{threading.get_ident()}"
+        try:
+            os.makedirs(tmp, exist_ok=True)
+            names = []
+            for i, vis in enumerate(visualizations):
+                name = f"vis_{i + 1:04d}.jpg"
+                if isinstance(vis, str):
+                    shutil.copyfile(vis, os.path.join(tmp, name))
+                else:
+                    Image.fromarray(vis).save(os.path.join(tmp, name), quality=85)
+                names.append(name)
+            with open(os.path.join(tmp, "result.json"), "w", encoding="utf-8") as f:
+                json.dump({"value": value, "visualizations": names, "created": time.time()}, f, ensure_ascii=False)
+            size, replaced = self._entry_size(tmp), self._entry_size(entry)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp, entry)  # publish atomically
+        except OSError as e:
+            print(f"Error writing cache entry {key}: {str(e)}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        with self._lock:
+            self._total_bytes += size - replaced
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in `max_bytes`, if its running total is over."""
+        with self._lock:
+            if self._total_bytes <= self.max_bytes:
+                return
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)  # also corrects the total for other processes' writes
+            for _, size, entry in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                print(f"DEBUG: Evicted cache entry {os.path.basename(entry)}")
+            self._total_bytes = total
@@ -0,0 +1,129 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _worker_init(torch_threads):
+    """Load the layout model and OCR engines once for the lifetime of a worker process."""
+    import torch
+
+    torch.set_num_threads(torch_threads)
+
+    import app
+    from text_extraction import load_ocr_engines
+
+    print(f"DEBUG: Shard worker {os.getpid()} loading model with {torch_threads} thread(s)")
+    app.model = app.load_model()
+    load_ocr_engines()
+
+
+def _worker_process(args):
+    pdf_path, conf_threshold, iou_threshold, pages, keep_visualizations, kwargs = args
+    import app
+    from tracing import DocumentTrace
+
+    trace = DocumentTrace(pdf_path, metrics=None)  # counted by the parent process when it merges the spans
+    visualizations, json_output = app.process_pdf(pdf_path, conf_threshold, iou_threshold, pages=pages, trace=trace,
+                                                  **kwargs)
+    return (visualizations if keep_visualizations else []), json_output, trace.spans
+
+
+class ShardPool:
+    """
+    Pool of worker processes that each hold their own layout model and OCR engines.
+
+    A document is split into runs of consecutive pages (shards) that are processed by the workers in parallel, so
+    long documents scale with the number of cores instead of running detection and OCR in a single process. Workers
+    are started with 'spawn' so no torch thread pools are inherited through fork, and every worker gets an equal
+    share of the cores for its intra-op threads.
+
+    Args:
+        workers (int): Number of worker processes.
+        torch_threads (int, optional): Intra-op threads per worker. Defaults to cpu_count // workers.
+    """
+
+    def __init__(self, workers, torch_threads=None):
+        self.workers = max(1, int(workers))
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self._pool = self._start()
+
+    def _start(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_worker_init,
+            initargs=(self.torch_threads,),
+        )
+
+    def restart(self):
+        """Replace the workers with fresh ones, e.g. after one died and broke the pool for every queued task."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = self._start()
+
+    def shards(self, total_pages, shard_size=None):
+        """
+        Split a document into shards of consecutive 0-based page indices.
+
+        Args:
+            total_pages (int): Number of pages in the document.
+            shard_size (int, optional): Pages per shard. Defaults to about four shards per worker, which keeps the
+                workers balanced when some pages take much longer than others.
+
+        Returns:
+            list: One list of page indices per shard, in document order.
+        """
+        shard_size = shard_size or max(1, math.ceil(total_pages / (self.workers * 4)))
+        return [list(range(i, min(i + shard_size, total_pages))) for i in range(0, total_pages, shard_size)]
+
+    def submit(self, pdf_path, conf_threshold, iou_threshold, pages=None, keep_visualizations=True, **kwargs):
+        """
+        Queue one shard, or a whole document when `pages` is None, for processing by a worker.
+
+        Args:
+            pdf_path (str): Path to the PDF document.
+            conf_threshold (float): Detection confidence threshold.
+            iou_threshold (float): NMS IoU threshold.
+            pages (list, optional): 0-based page indices to process.
+            keep_visualizations (bool): Send the page visualizations back, skip it when only the JSON is needed.
+            **kwargs: Passed on to process_pdf() in the worker.
+
+        Returns:
+            concurrent.futures.Future: Resolves to (visualizations, json_output, spans), the spans of the shard's
+                trace to merge into a DocumentTrace.
+        """
+        return self._pool.submit(
+            _worker_process, (pdf_path, conf_threshold, iou_threshold, pages, keep_visualizations, kwargs)
+        )
+
+    def map(self, pdf_path, conf_threshold, iou_threshold, shards, **kwargs):
+        """
+        Process the shards of a PDF in parallel.
+
+        Args:
+            pdf_path (str): Path to the PDF document.
+            conf_threshold (float): Detection confidence threshold.
+            iou_threshold (float): NMS IoU threshold.
+            shards (list): Page index lists from shards().
+            **kwargs: Passed on to process_pdf() in the workers.
+
+        Yields:
+            tuple: (visualizations, json_output, spans) of every shard, in shard order as soon as it and all earlier
+                shards are done.
+        """
+        futures = [self.submit(pdf_path, conf_threshold, iou_threshold, pages, **kwargs) for pages in shards]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
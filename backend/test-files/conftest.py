@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The backend modules (app, rasterizer, model_runtime, ...) are top-level scripts, not an installed package
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,56 @@
+from copy import deepcopy
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+cv2 = pytest.importorskip("cv2")
+
+from doclayout_yolo.data.augment import LetterBox  # noqa: E402
+from doclayout_yolo.nn.modules import DilatedBlock  # noqa: E402
+from doclayout_yolo.nn.tasks import YOLOv10DetectionModel  # noqa: E402
+
+CFG = Path(__file__).resolve().parents[1] / "doclayout_yolo" / "cfg" / "models" / "v10" / "yolov10m-doclayout.yaml"
+PAGE = Path(__file__).resolve().parents[1] / "assets" / "example" / "academic.jpg"
+
+
+def randomize_batchnorm(model):
+    """Give every BatchNorm non-trivial statistics, so folding them into the kernels is actually exercised."""
+    for m in model.modules():
+        if isinstance(m, torch.nn.BatchNorm2d):
+            m.running_mean.uniform_(-0.1, 0.1)
+            m.running_var.uniform_(0.5, 1.5)
+            m.weight.data.uniform_(0.5, 1.5)
+            m.bias.data.uniform_(-0.1, 0.1)
+    return model.eval()
+
+
+def page_tensor(imgsz=320):
+    img = LetterBox((imgsz, imgsz), auto=False)(image=cv2.imread(str(PAGE)))
+    return torch.from_numpy(img[..., ::-1].transpose(2, 0, 1).copy()).float()[None] / 255
+
+
+@pytest.mark.parametrize("fuse", ["sum", "glu"])
+def test_dilated_block_fuse(fuse):
+    """A fused DilatedBlock reproduces the unfused block on page features."""
+    torch.manual_seed(0)
+    block = randomize_batchnorm(DilatedBlock(3, [1, 2, 3], 3, fuse=fuse))
+    fused = deepcopy(block)
+    fused.fuse_convs()
+    fused.forward = fused.forward_fuse
+    assert not hasattr(fused.dcv, "bn")
+    x = page_tensor()
+    with torch.no_grad():
+        torch.testing.assert_close(fused(x), block(x), rtol=1e-4, atol=1e-4)
+
+
+def test_model_fuse():
+    """fuse() on the DocLayout-YOLO architecture leaves its predictions on a real page unchanged."""
+    torch.manual_seed(0)
+    model = randomize_batchnorm(YOLOv10DetectionModel(str(CFG), nc=10, verbose=False))
+    fused = deepcopy(model).fuse(verbose=False)
+    assert fused.is_fused()
+    x = page_tensor()
+    with torch.no_grad():
+        expected, actual = model(x)["one2one"], fused(x)["one2one"]
+    torch.testing.assert_close(actual, expected, rtol=1e-3, atol=1e-2)
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import doclayout_yolo  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+from model_runtime import export_path, load_layout_model  # noqa: E402
+from quantize import quantization_target, save_int8_report  # noqa: E402
+
+
+@pytest.mark.parametrize("passed", [True, False])
+def test_int8_sidecar_loads_in_app(tmp_path, monkeypatch, passed):
+    """An INT8 model quantized for a registered name is found by the runtime loader exactly as the app calls it."""
+    store = str(tmp_path / "models")
+    os.makedirs(os.path.join(store, "layout"))
+    download = os.path.join(store, "layout", "weights.pt")
+    torch.save({"model": torch.nn.Linear(1, 1).half()}, download)
+    registry = ModelRegistry(store, offline=True)
+    registry.register("layout", download)
+
+    weights, checksum = quantization_target("layout", store)
+    os.makedirs(export_path(weights, "openvino_int8"))
+    save_int8_report(weights, checksum, 1024, {"passed": passed})
+
+    monkeypatch.setattr(doclayout_yolo, "YOLOv10", lambda path, task=None: path, raising=False)
+    model, runtime = load_layout_model(registry.inference_weights("layout"), runtime="openvino_int8", imgsz=1024,
+                                       checksum=registry.checksum("layout"))
+    if passed:
+        assert (model, runtime) == (export_path(weights, "openvino_int8"), "openvino_int8")
+    else:
+        assert (model, runtime) == (weights, "torch")
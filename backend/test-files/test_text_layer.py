@@ -0,0 +1,40 @@
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from text_layer import TextLayer  # noqa: E402
+
+SCALE = 2  # rendered pixels per point
+
+
+@pytest.fixture(params=[0, 90, 180, 270])
+def rotated_pdf(tmp_path, request):
+    """A one-page PDF with two words far apart, displayed with the given /Rotate."""
+    doc = fitz.open()
+    page = doc.new_page(width=400, height=600)
+    page.insert_text((50, 100), "Heading", fontsize=20)
+    page.insert_text((250, 500), "Footer", fontsize=20)
+    page.set_rotation(request.param)
+    path = tmp_path / f"rotated_{request.param}.pdf"
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def pixel_bbox(page, word_rect):
+    """Pixel bbox of an unrotated word rectangle on the page rendered as displayed."""
+    shown = fitz.Rect(word_rect) * page.rotation_matrix
+    return {"x1": shown.x0 * SCALE, "y1": shown.y0 * SCALE, "x2": shown.x1 * SCALE, "y2": shown.y1 * SCALE}
+
+
+def test_extract_on_rotated_page(rotated_pdf):
+    layer = TextLayer(str(rotated_pdf))
+    try:
+        page = layer.doc[0]
+        image_size = (page.rect.width * SCALE, page.rect.height * SCALE)  # what the rasterizer renders
+        words = {w[4]: fitz.Rect(w[:4]) for w in layer.words(0)}
+        for word, other in (("Heading", "Footer"), ("Footer", "Heading")):
+            text = layer.extract(0, pixel_bbox(page, words[word] + (-2, -2, 2, 2)), image_size)
+            assert text == word, f"rotation {page.rotation}: expected {word!r}, got {text!r} ({other} must not match)"
+    finally:
+        layer.close()
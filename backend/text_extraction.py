@@ -1,10 +1,57 @@
 import os
+import functools
+import tempfile
 import easyocr
 import numpy as np
 import pytesseract
 from PIL import Image
 from pix2tex.cli import LatexOCR
 
+from tracing import annotate, span
+
+FORMULA_TYPES = ["isolate_formula", "formula_caption", "formula"]
+
+
+@functools.lru_cache(maxsize=None)
+def ocr_engine_versions():
+    """Versions of the OCR engines used for text extraction, part of result cache keys"""
+    from importlib.metadata import PackageNotFoundError, version
+
+    versions = {}
+    for package in ["easyocr", "pytesseract", "pix2tex", "img2table"]:
+        try:
+            versions[package] = version(package)
+        except PackageNotFoundError:
+            versions[package] = None
+    try:
+        versions["tesseract"] = str(pytesseract.get_tesseract_version())
+    except Exception:
+        versions["tesseract"] = None
+    return versions
+
+
+@functools.lru_cache(maxsize=None)
+def get_latex_ocr():
+    """LaTeX OCR model, loaded on first use and shared by every later call"""
+    print("DEBUG: Loading LaTeX OCR model")
+    return LatexOCR()
+
+
+@functools.lru_cache(maxsize=None)
+def get_easyocr_reader():
+    """EasyOCR reader, loaded on first use and shared by every later call"""
+    print("DEBUG: Initializing EasyOCR reader")
+    return easyocr.Reader(["en"], gpu=False)
+
+
+def load_ocr_engines():
+    """Load the OCR engines up front, e.g. when a worker process starts"""
+    get_easyocr_reader()
+    try:
+        get_latex_ocr()
+    except Exception as e:
+        print(f"DEBUG: LaTeX OCR unavailable: {str(e)}")
+
 
 def resize_for_ocr(image):
     """Resize image to fit within OCR processing limits while maintaining quality"""
@@ -129,8 +176,9 @@ def extract_formula_text(cropped_image):
         # Try LaTeX OCR first
         try:
             print("DEBUG: Attempting LaTeX OCR extraction")
-            model = LatexOCR()
-            latex_text = model(cropped_image)
+            model = get_latex_ocr()
+            with span("ocr", engine="latex_ocr"):
+                latex_text = model(cropped_image)
             if latex_text:
                 print(f"DEBUG: Successfully extracted LaTeX: {latex_text[:50]}...")
                 return latex_text.strip()
@@ -147,9 +195,10 @@ def extract_formula_text(cropped_image):
 
         print("DEBUG: Using Tesseract for formula recognition")
         custom_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,;:()[]{}+-=<>/*^_\\"\' \n -c preserve_interword_spaces=1 -c textord_heavy_nr=1 -c textord_min_linesize=2.5'
-        extracted_text = pytesseract.image_to_string(
-            resized_image, config=custom_config, lang="eng"
-        )
+        with span("ocr", engine="tesseract"):
+            extracted_text = pytesseract.image_to_string(
+                resized_image, config=custom_config, lang="eng"
+            )
         if extracted_text:
             print(f"DEBUG: Successfully extracted formula text: {extracted_text[:50]}...")
         else:
@@ -169,8 +218,9 @@ def extract_table_text(cropped_image):
             print("DEBUG: Cannot extract table from None image")
             return None
 
-        # Save the cropped image temporarily
-        temp_path = "temp_table.png"
+        # Save the cropped image temporarily, unique per call as pages are extracted concurrently
+        fd, temp_path = tempfile.mkstemp(suffix=".png")
+        os.close(fd)
         cropped_image.save(temp_path)
 
         try:
@@ -182,12 +232,13 @@ def extract_table_text(cropped_image):
             ocr = TesseractOCR(n_threads=1, lang="eng")
             img = Image(src=temp_path)
             
-            extracted_tables = img.extract_tables(
-                ocr=ocr,
-                implicit_rows=False,
-                borderless_tables=True,
-                min_confidence=50
-            )
+            with span("ocr", engine="img2table"):
+                extracted_tables = img.extract_tables(
+                    ocr=ocr,
+                    implicit_rows=False,
+                    borderless_tables=True,
+                    min_confidence=50
+                )
 
             if extracted_tables:
                 print("DEBUG: Successfully extracted table with img2table")
@@ -215,7 +266,8 @@ def extract_table_text(cropped_image):
             return None
 
         custom_config = r"--oem 3 --psm 6 -c preserve_interword_spaces=1"
-        extracted_text = pytesseract.image_to_string(resized_image, config=custom_config)
+        with span("ocr", engine="tesseract"):
+            extracted_text = pytesseract.image_to_string(resized_image, config=custom_config)
 
         if extracted_text:
             print(f"DEBUG: Successfully extracted table text with Tesseract: {extracted_text[:50]}...")
@@ -242,24 +294,24 @@ def extract_text_with_easyocr(cropped_image):
             print("DEBUG: Failed to resize image for EasyOCR")
             return None
 
-        print("DEBUG: Initializing EasyOCR reader")
-        reader = easyocr.Reader(["en"], gpu=False)
+        reader = get_easyocr_reader()
         # Convert PIL Image to numpy array for EasyOCR
         text_image_np = np.array(resized_image)
         print("DEBUG: Running EasyOCR text detection")
         # Perform OCR with optimized parameters
-        results = reader.readtext(
-            text_image_np,
-            paragraph=True,
-            batch_size=1,
-            min_size=10,
-            contrast_ths=0.1,
-            adjust_contrast=0.5,
-            text_threshold=0.7,
-            link_threshold=0.4,
-            low_text=0.4,
-            detail=0,
-        )
+        with span("ocr", engine="easyocr"):
+            results = reader.readtext(
+                text_image_np,
+                paragraph=True,
+                batch_size=1,
+                min_size=10,
+                contrast_ths=0.1,
+                adjust_contrast=0.5,
+                text_threshold=0.7,
+                link_threshold=0.4,
+                low_text=0.4,
+                detail=0,
+            )
         extracted_text = " ".join(results)
         if extracted_text:
             print(f"DEBUG: Successfully extracted text: {extracted_text[:50]}...")
@@ -334,218 +386,256 @@ def sort_elements_by_reading_order(elements, page_width, page_height):
     return sorted_elements
 
 
-def get_text(json_output, page_images):
-    """Extract text from different document elements using specialized approaches"""
-    print("\nDEBUG: Starting text extraction")
-    print(
-        f"DEBUG: Total pages to process: {json_output['document_layout']['total_pages']}"
-    )
-    extracted_content = []
+def get_page_text(layout_page, page_image, page_idx, text_layer=None):
+    """Extract text from the elements of a single page
 
-    for page_idx, page_image in enumerate(page_images):
-        print(f"\nDEBUG: Processing page {page_idx + 1}")
-        if page_image is None:
-            print(f"DEBUG: Skipping page {page_idx + 1} due to missing image")
-            continue
+    Call it inside a tracing span, e.g. the page's 'extract' span, which scopes the element attributes that the
+    crop and OCR spans of every element are labelled with.
 
-        page_content = []
-        width, height = page_image.size
-        elements = json_output["document_layout"]["pages"][page_idx]["elements"]
-        print(f"DEBUG: Found {len(elements)} elements on page {page_idx + 1}")
+    Args:
+        layout_page (dict): Page entry of the document layout with 'page_number' and 'elements'.
+        page_image (PIL.Image | LazyPage): Page image the layout bboxes refer to.
+        page_idx (int): 0-based index of the page in the document.
+        text_layer (TextLayer, optional): Embedded text source used before falling back to OCR.
+
+    Returns:
+        dict: {'page_number', 'elements'} with the extracted text of every element.
+    """
+    page_content = []
+    width, height = page_image.size
+    pdf_page_idx = layout_page.get("page_number", page_idx + 1) - 1
+    elements = layout_page["elements"]
+    print(f"DEBUG: Found {len(elements)} elements on page {page_idx + 1}")
 
-        # Sort elements by reading order
+    # Sort elements by reading order
+    with span("reading_order", elements=len(elements)):
         elements = sort_elements_by_reading_order(elements, width, height)
-        print("DEBUG: Elements sorted by reading order")
-
-        # Filter out overlapping elements and handle duplicates
-        filtered_elements = []
-        processed_areas = []
-
-        # Sort elements by confidence and area
-        sorted_elements = sorted(
-            elements,
-            key=lambda x: (
-                x.get("confidence", 0),
-                (x["bbox"]["x2"] - x["bbox"]["x1"])
-                * (x["bbox"]["y2"] - x["bbox"]["y1"]),
-            ),
-            reverse=True,
-        )
+    print("DEBUG: Elements sorted by reading order")
+
+    # Filter out overlapping elements and handle duplicates
+    filtered_elements = []
+    processed_areas = []
+
+    # Sort elements by confidence and area
+    sorted_elements = sorted(
+        elements,
+        key=lambda x: (
+            x.get("confidence", 0),
+            (x["bbox"]["x2"] - x["bbox"]["x1"])
+            * (x["bbox"]["y2"] - x["bbox"]["y1"]),
+        ),
+        reverse=True,
+    )
 
-        for elem in sorted_elements:
-            # Calculate current element area
-            curr_bbox = elem["bbox"]
-            significant_overlap = False
-
-            # Check overlap with previously processed areas
-            for prev_area in processed_areas:
-                x1 = max(curr_bbox["x1"], prev_area[0])
-                y1 = max(curr_bbox["y1"], prev_area[1])
-                x2 = min(curr_bbox["x2"], prev_area[2])
-                y2 = min(curr_bbox["y2"], prev_area[3])
-
-                if x1 < x2 and y1 < y2:
-                    overlap_area = (x2 - x1) * (y2 - y1)
-                    curr_area = (curr_bbox["x2"] - curr_bbox["x1"]) * (
-                        curr_bbox["y2"] - curr_bbox["y1"]
-                    )
-
-                    # If more than 30% overlap, consider it significant
-                    if overlap_area / curr_area > 0.3:
-                        significant_overlap = True
-                        break
-
-            if not significant_overlap:
-                filtered_elements.append(elem)
-                processed_areas.append(
-                    (curr_bbox["x1"], curr_bbox["y1"], curr_bbox["x2"], curr_bbox["y2"])
+    for elem in sorted_elements:
+        # Calculate current element area
+        curr_bbox = elem["bbox"]
+        significant_overlap = False
+
+        # Check overlap with previously processed areas
+        for prev_area in processed_areas:
+            x1 = max(curr_bbox["x1"], prev_area[0])
+            y1 = max(curr_bbox["y1"], prev_area[1])
+            x2 = min(curr_bbox["x2"], prev_area[2])
+            y2 = min(curr_bbox["y2"], prev_area[3])
+
+            if x1 < x2 and y1 < y2:
+                overlap_area = (x2 - x1) * (y2 - y1)
+                curr_area = (curr_bbox["x2"] - curr_bbox["x1"]) * (
+                    curr_bbox["y2"] - curr_bbox["y1"]
                 )
 
-        # Sort elements by vertical position for better context
-        filtered_elements.sort(key=lambda x: (x["bbox"]["y1"], x["bbox"]["x1"]))
-
-        # Track previous element type for context
-        prev_element_type = None
+                # If more than 30% overlap, consider it significant
+                if overlap_area / curr_area > 0.3:
+                    significant_overlap = True
+                    break
 
-        for element_idx, element in enumerate(elements):
-            element_type = element["type"].lower()
-            bbox = element["bbox"]
-            print(
-                f"\nDEBUG: Processing element {element_idx + 1}/{len(elements)} of type: {element_type}"
+        if not significant_overlap:
+            filtered_elements.append(elem)
+            processed_areas.append(
+                (curr_bbox["x1"], curr_bbox["y1"], curr_bbox["x2"], curr_bbox["y2"])
             )
 
-            # Additional validation for bbox coordinates
-            if not all(
-                isinstance(v, (int, float))
-                for v in [bbox["x1"], bbox["y1"], bbox["x2"], bbox["y2"]]
-            ):
-                print(f"DEBUG: Invalid bbox coordinates for element {element_idx + 1}")
-                continue
+    # Sort elements by vertical position for better context
+    filtered_elements.sort(key=lambda x: (x["bbox"]["y1"], x["bbox"]["x1"]))
 
-            # Ensure bbox coordinates are within image bounds and have minimum size
-            min_size = 20  # Minimum size in pixels
-            width, height = page_image.size
+    # Track previous element type for context
+    prev_element_type = None
 
-            # Validate and adjust bbox coordinates
-            bbox["x1"] = max(0, min(bbox["x1"], width))
-            bbox["y1"] = max(0, min(bbox["y1"], height))
-            bbox["x2"] = max(bbox["x1"] + min_size, min(bbox["x2"], width))
-            bbox["y2"] = max(bbox["y1"] + min_size, min(bbox["y2"], height))
+    for element_idx, element in enumerate(elements):
+        element_type = element["type"].lower()
+        bbox = element["bbox"]
+        annotate(element=element_idx + 1, element_type=element_type)  # inherited by the spans of this element
+        print(
+            f"\nDEBUG: Processing element {element_idx + 1}/{len(elements)} of type: {element_type}"
+        )
 
-            # Additional validation for figure captions
-            if element_type in ["figure_caption", "caption"]:
-                # Ensure caption has reasonable height (not too tall)
-                caption_height = bbox["y2"] - bbox["y1"]
-                if (
-                    caption_height > height * 0.2
-                ):  # Caption shouldn't be more than 20% of page height
-                    bbox["y2"] = bbox["y1"] + min(caption_height, height * 0.2)
-
-            # Normalize bbox coordinates to 0-1 range
-            bbox_tuple = (
-                bbox["x1"] / width,
-                bbox["y1"] / height,
-                bbox["x2"] / width,
-                bbox["y2"] / height,
-            )
+        # Additional validation for bbox coordinates
+        if not all(
+            isinstance(v, (int, float))
+            for v in [bbox["x1"], bbox["y1"], bbox["x2"], bbox["y2"]]
+        ):
+            print(f"DEBUG: Invalid bbox coordinates for element {element_idx + 1}")
+            continue
 
-            # Validate bbox dimensions
-            if bbox_tuple[2] <= bbox_tuple[0] or bbox_tuple[3] <= bbox_tuple[1]:
-                print(f"DEBUG: Invalid bbox dimensions for element {element_idx + 1}")
-                continue
+        # Ensure bbox coordinates are within image bounds and have minimum size
+        min_size = 20  # Minimum size in pixels
+        width, height = page_image.size
+
+        # Validate and adjust bbox coordinates
+        bbox["x1"] = max(0, min(bbox["x1"], width))
+        bbox["y1"] = max(0, min(bbox["y1"], height))
+        bbox["x2"] = max(bbox["x1"] + min_size, min(bbox["x2"], width))
+        bbox["y2"] = max(bbox["y1"] + min_size, min(bbox["y2"], height))
+
+        # Additional validation for figure captions
+        if element_type in ["figure_caption", "caption"]:
+            # Ensure caption has reasonable height (not too tall)
+            caption_height = bbox["y2"] - bbox["y1"]
+            if (
+                caption_height > height * 0.2
+            ):  # Caption shouldn't be more than 20% of page height
+                bbox["y2"] = bbox["y1"] + min(caption_height, height * 0.2)
+
+        # Normalize bbox coordinates to 0-1 range
+        bbox_tuple = (
+            bbox["x1"] / width,
+            bbox["y1"] / height,
+            bbox["x2"] / width,
+            bbox["y2"] / height,
+        )
+
+        # Validate bbox dimensions
+        if bbox_tuple[2] <= bbox_tuple[0] or bbox_tuple[3] <= bbox_tuple[1]:
+            print(f"DEBUG: Invalid bbox dimensions for element {element_idx + 1}")
+            continue
 
+        extracted_text = None
+
+        # Born-digital fast path: read the embedded text layer, formulas still need LaTeX OCR
+        if text_layer is not None and element_type not in FORMULA_TYPES:
+            with span("text_layer"):
+                extracted_text = text_layer.extract(
+                    pdf_page_idx, bbox, (width, height), keep_lines=element_type == "table"
+                )
+
+        if extracted_text:
+            print("DEBUG: Using embedded PDF text layer")
+            cropped_image = None
+        else:
             # Crop image for the current element
-            cropped_image = crop_image(page_image, bbox_tuple)
+            with span("crop"):  # includes rendering the region for two-pass rasterization
+                cropped_image = crop_image(page_image, bbox_tuple)
             if cropped_image is None:
                 print(f"DEBUG: Failed to crop image for element {element_idx + 1}")
                 continue
 
-            extracted_text = None
-
-            # Context-aware element type handling
-            if element_type == "table":
-                print("DEBUG: Using Tesseract for table extraction")
+        # Context-aware element type handling
+        if element_type == "table":
+            print("DEBUG: Using Tesseract for table extraction")
+            extracted_text = extracted_text or extract_table_text(cropped_image)
+        elif element_type in FORMULA_TYPES:
+            print("DEBUG: Using formula extraction method")
+            extracted_text = extract_formula_text(cropped_image)
+            if not extracted_text:
+                print("DEBUG: Formula extraction failed, falling back to Tesseract")
                 extracted_text = extract_table_text(cropped_image)
-            elif element_type in ["isolate_formula", "formula_caption", "formula"]:
-                print("DEBUG: Using formula extraction method")
-                extracted_text = extract_formula_text(cropped_image)
-                if not extracted_text:
-                    print("DEBUG: Formula extraction failed, falling back to Tesseract")
-                    extracted_text = extract_table_text(cropped_image)
-            elif element_type in ["title", "section", "heading"]:
-                # Enhanced title validation with improved spacing and context checks
-                is_valid_title = False
+        elif element_type in ["title", "section", "heading"]:
+            # Enhanced title validation with improved spacing and context checks
+            is_valid_title = False
+            if (
+                page_idx == 0 and bbox["y1"] < height * 0.25
+            ):  # Main title at top of first page, increased threshold
+                is_valid_title = True
+            elif (
+                bbox["y1"] < height * 0.2
+            ):  # Section titles at top of other pages, increased threshold
+                is_valid_title = True
+            elif (
+                prev_element_type != "title" and len(elements) > element_idx + 1
+            ):  # Check spacing
+                next_element = elements[element_idx + 1]
+                spacing = next_element["bbox"]["y1"] - bbox["y2"]
+                # Consider both spacing and relative position
                 if (
-                    page_idx == 0 and bbox["y1"] < height * 0.25
-                ):  # Main title at top of first page, increased threshold
+                    spacing > height * 0.015
+                    and bbox["y2"] - bbox["y1"] < height * 0.1
+                ):
                     is_valid_title = True
-                elif (
-                    bbox["y1"] < height * 0.2
-                ):  # Section titles at top of other pages, increased threshold
+            # Additional check for standalone titles
+            elif bbox["y2"] - bbox["y1"] < height * 0.08 and element_idx > 0:
+                prev_element = elements[element_idx - 1]
+                prev_spacing = bbox["y1"] - prev_element["bbox"]["y2"]
+                if prev_spacing > height * 0.02:
                     is_valid_title = True
-                elif (
-                    prev_element_type != "title" and len(elements) > element_idx + 1
-                ):  # Check spacing
-                    next_element = elements[element_idx + 1]
-                    spacing = next_element["bbox"]["y1"] - bbox["y2"]
-                    # Consider both spacing and relative position
-                    if (
-                        spacing > height * 0.015
-                        and bbox["y2"] - bbox["y1"] < height * 0.1
-                    ):
-                        is_valid_title = True
-                # Additional check for standalone titles
-                elif bbox["y2"] - bbox["y1"] < height * 0.08 and element_idx > 0:
-                    prev_element = elements[element_idx - 1]
-                    prev_spacing = bbox["y1"] - prev_element["bbox"]["y2"]
-                    if prev_spacing > height * 0.02:
-                        is_valid_title = True
-
-                if is_valid_title:
-                    print("DEBUG: Using EasyOCR for title/heading extraction")
-                    extracted_text = extract_text_with_easyocr(cropped_image)
-                else:
-                    print("DEBUG: Reclassifying title element as plain text")
-                    element_type = "plain_text"
-                    extracted_text = extract_text_with_easyocr(cropped_image)
-            elif element_type in ["figure", "figure_caption", "caption"]:
-                print("DEBUG: Using specialized settings for figure caption")
-                if prev_element_type == "figure":
-                    extracted_text = extract_table_text(cropped_image)
-                else:
-                    print(
-                        "DEBUG: Caption without figure, using general text extraction"
-                    )
-                    extracted_text = extract_text_with_easyocr(cropped_image)
-            else:
-                print("DEBUG: Using EasyOCR for general text extraction")
-                extracted_text = extract_text_with_easyocr(cropped_image)
-                if not extracted_text:
-                    print("DEBUG: EasyOCR failed, falling back to Tesseract")
-                    extracted_text = extract_table_text(cropped_image)
 
-            if extracted_text:
-                print(
-                    f"DEBUG: Successfully extracted text for element {element_idx + 1}"
-                )
+            if is_valid_title:
+                print("DEBUG: Using EasyOCR for title/heading extraction")
+                extracted_text = extracted_text or extract_text_with_easyocr(cropped_image)
+            else:
+                print("DEBUG: Reclassifying title element as plain text")
+                element_type = "plain_text"
+                extracted_text = extracted_text or extract_text_with_easyocr(cropped_image)
+        elif element_type in ["figure", "figure_caption", "caption"]:
+            print("DEBUG: Using specialized settings for figure caption")
+            if prev_element_type == "figure":
+                extracted_text = extracted_text or extract_table_text(cropped_image)
+            else:
                 print(
-                    f"DEBUG: Element type: {element_type}, Text preview: {extracted_text[:50]}..."
+                    "DEBUG: Caption without figure, using general text extraction"
                 )
-            else:
-                print(f"DEBUG: No text extracted for element {element_idx + 1}")
+                extracted_text = extracted_text or extract_text_with_easyocr(cropped_image)
+        else:
+            print("DEBUG: Using EasyOCR for general text extraction")
+            extracted_text = extracted_text or extract_text_with_easyocr(cropped_image)
+            if not extracted_text:
+                print("DEBUG: EasyOCR failed, falling back to Tesseract")
+                extracted_text = extract_table_text(cropped_image)
 
-            page_content.append(
-                {"type": element_type, "text": extracted_text, "bbox": bbox}
+        if extracted_text:
+            print(
+                f"DEBUG: Successfully extracted text for element {element_idx + 1}"
             )
+            print(
+                f"DEBUG: Element type: {element_type}, Text preview: {extracted_text[:50]}..."
+            )
+        else:
+            print(f"DEBUG: No text extracted for element {element_idx + 1}")
 
-            # Update previous element type
-            prev_element_type = element_type
-
-        print(f"DEBUG: Completed processing page {page_idx + 1}")
-        extracted_content.append(
-            {"page_number": page_idx + 1, "elements": page_content}
+        page_content.append(
+            {"type": element_type, "text": extracted_text, "bbox": bbox}
         )
 
+        # Update previous element type
+        prev_element_type = element_type
+
+    print(f"DEBUG: Completed processing page {page_idx + 1}")
+    return {"page_number": layout_page.get("page_number", page_idx + 1), "elements": page_content}
+
+def get_text(json_output, page_images, text_layer=None):
+    """Extract text from different document elements using specialized approaches
+
+    When a TextLayer is given, regions are first read from the PDF's embedded text and only
+    regions without text (scanned pages, figures) or formulas go through OCR.
+    """
+    print("\nDEBUG: Starting text extraction")
+    print(
+        f"DEBUG: Total pages to process: {json_output['document_layout']['total_pages']}"
+    )
+    extracted_content = []
+
+    for page_idx, page_image in enumerate(page_images):
+        print(f"\nDEBUG: Processing page {page_idx + 1}")
+        if page_image is None:
+            print(f"DEBUG: Skipping page {page_idx + 1} due to missing image")
+            continue
+
+        layout_page = json_output["document_layout"]["pages"][page_idx]
+        with span("extract", page=page_idx + 1):
+            extracted_content.append(
+                get_page_text(layout_page, page_image, page_idx, text_layer=text_layer)
+            )
+
     print("\nDEBUG: Text extraction completed for all pages")
     return {
         "total_pages": json_output["document_layout"]["total_pages"],
@@ -0,0 +1,93 @@
+import threading
+
+
+class TextLayer:
+    """
+    Read text straight from a PDF's embedded text layer.
+
+    Layout boxes come from page rasters, so every lookup maps the pixel bbox back to page coordinates (points)
+    using the raster size, then collects the words whose centre falls inside that rectangle. Born-digital pages
+    answer in milliseconds; scanned pages and figures have no words and fall back to OCR.
+
+    Args:
+        pdf_path (str): Path to the PDF document.
+    """
+
+    def __init__(self, pdf_path):
+        import fitz
+
+        self.doc = fitz.open(pdf_path)
+        self._words = {}
+        self._lock = threading.Lock()  # lookups may come from several text extraction threads
+
+    def words(self, page_index):
+        """Return the cached (x0, y0, x1, y1, text, block, line, word) tuples of a 0-based page."""
+        with self._lock:
+            if page_index not in self._words:
+                self._words[page_index] = self.doc[page_index].get_text("words", sort=True)
+            return self._words[page_index]
+
+    def has_text(self, page_index):
+        """Check whether a page carries any extractable text."""
+        return len(self.words(page_index)) > 0
+
+    def to_page_rect(self, page_index, bbox, image_size):
+        """
+        Convert a pixel bbox on a rendered page into the coordinates of its text-layer words.
+
+        Rasters show the page as displayed, i.e. with its /Rotate applied, while text-layer words are in unrotated
+        page space. The bbox is scaled to the displayed page and then derotated, so rotated pages match as well.
+
+        Args:
+            page_index (int): 0-based page index.
+            bbox (dict): Bounding box with x1, y1, x2, y2 in pixels of the rendered page.
+            image_size (tuple): (width, height) of the rendered page.
+
+        Returns:
+            tuple: (x0, y0, x1, y1) in points, top-left origin, in the unrotated page space of words().
+        """
+        import fitz
+
+        with self._lock:
+            page = self.doc[page_index]
+            rect, derotation = page.rect, page.derotation_matrix
+        sx = rect.width / image_size[0]
+        sy = rect.height / image_size[1]
+        shown = fitz.Rect(
+            rect.x0 + bbox["x1"] * sx,
+            rect.y0 + bbox["y1"] * sy,
+            rect.x0 + bbox["x2"] * sx,
+            rect.y0 + bbox["y2"] * sy,
+        )
+        return tuple(shown * derotation)
+
+    def extract(self, page_index, bbox, image_size, keep_lines=False):
+        """
+        Collect the text-layer words inside a layout region.
+
+        Args:
+            page_index (int): 0-based page index.
+            bbox (dict): Bounding box with x1, y1, x2, y2 in pixels of the rendered page.
+            image_size (tuple): (width, height) of the rendered page.
+            keep_lines (bool): Join lines with newlines instead of spaces, e.g. for tables.
+
+        Returns:
+            str | None: The region text, or None when the region has no text layer.
+        """
+        if page_index >= self.doc.page_count or not self.has_text(page_index):
+            return None
+        x0, y0, x1, y1 = self.to_page_rect(page_index, bbox, image_size)
+
+        lines = {}
+        for wx0, wy0, wx1, wy1, word, block_no, line_no, _ in self.words(page_index):
+            cx, cy = (wx0 + wx1) / 2, (wy0 + wy1) / 2
+            if x0 <= cx <= x1 and y0 <= cy <= y1:
+                lines.setdefault((block_no, line_no), []).append(word)
+        if not lines:
+            return None
+
+        text = ("\n" if keep_lines else " ").join(" ".join(words) for words in lines.values())
+        return text.strip() or None
+
+    def close(self):
+        self.doc.close()
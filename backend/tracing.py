@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import uuid
+import functools
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+# Upper bounds of the latency histogram buckets in seconds, from a fast crop to a slow page
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Span attributes that become histogram labels; everything else, e.g. page numbers, is only kept in the trace
+LABELS = ("element_type", "engine", "cascade")
+
+_local = threading.local()
+
+
+class MetricsRegistry:
+    """
+    Thread-safe latency histograms of pipeline spans, one series per span name and label values, and event counters.
+
+    Args:
+        buckets (tuple): Ascending bucket upper bounds in seconds, an overflow bucket is added after the last.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+        self._counters = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def increment(self, name, n=1, **labels):
+        """Add `n` to the counter of `name` and labels, e.g. the pages the detection cascade escalated."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def counters(self):
+        """Return every counter with its labels and value, sorted by name."""
+        with self._lock:
+            items = sorted(self._counters.items())
+        return [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in items]
+
+    def observe(self, name, seconds, **labels):
+        """Count one span of `seconds` under its name and labels."""
+        key = self._key(name, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            series["counts"][bisect_left(self.buckets, seconds)] += 1
+            series["sum"] += seconds
+
+    def _quantile(self, counts, q):
+        """Upper bound of the bucket holding the q-quantile, None if it is the overflow bucket."""
+        target, seen = q * sum(counts), 0
+        for bound, n in zip(self.buckets, counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return None
+
+    def snapshot(self):
+        """
+        Return every series with its count, total and mean seconds, p50/p95 bucket bounds and cumulative buckets.
+
+        Series are sorted by total time, so the stage that costs the most comes first.
+        """
+        with self._lock:
+            items = [(name, labels, list(s["counts"]), s["sum"]) for (name, labels), s in self._series.items()]
+        out = []
+        for name, labels, counts, total in sorted(items, key=lambda item: -item[3]):
+            count, cumulative = sum(counts), 0
+            buckets = {}
+            for bound, n in zip((*self.buckets, "+Inf"), counts):
+                cumulative += n
+                buckets[str(bound)] = cumulative
+            out.append({
+                "name": name,
+                "labels": dict(labels),
+                "count": count,
+                "sum_seconds": total,
+                "mean_seconds": total / count if count else 0.0,
+                "p50_seconds": self._quantile(counts, 0.5),
+                "p95_seconds": self._quantile(counts, 0.95),
+                "buckets": buckets,
+            })
+        return out
+
+    def prometheus(self, metric="pdf_pipeline_span_seconds", prefix="pdf_pipeline"):
+        """Render the histograms, and the counters as `<prefix>_<name>_total`, in the Prometheus text format."""
+        lines = [f"# HELP {metric} Duration of PDF pipeline spans.", f"# TYPE {metric} histogram"]
+        for series in self.snapshot():
+            labels = ",".join([f'span="{series["name"]}"'] + [f'{k}="{v}"' for k, v in series["labels"].items()])
+            for le, n in series["buckets"].items():
+                lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {n}')
+            lines.append(f"{metric}_sum{{{labels}}} {series['sum_seconds']}")
+            lines.append(f"{metric}_count{{{labels}}} {series['count']}")
+        typed = set()
+        for counter in self.counters():
+            name = f"{prefix}_{counter['name']}_total"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            labels = ",".join(f'{k}="{v}"' for k, v in counter["labels"].items())
+            lines.append(f"{name}{{{labels}}} {counter['value']}" if labels else f"{name} {counter['value']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._counters.clear()
+
+
+METRICS = MetricsRegistry()
+
+
+class DocumentTrace:
+    """
+    Structured trace of one document: a timed span for every pipeline stage, page, element and OCR engine call.
+
+    Spans are opened with the module-level span() on a thread the trace is activated on (see activate()); pipeline
+    stages run on their own threads, so each stage activates the trace for the work it does. Every span is also
+    counted in `metrics`.
+
+    Args:
+        document (str): Document the trace belongs to, e.g. its path.
+        metrics (MetricsRegistry, optional): Histograms to count the spans in. Defaults to the process-wide METRICS.
+        started (float, optional): Wall-clock time the document's processing started. Defaults to now.
+    """
+
+    def __init__(self, document, metrics=METRICS, started=None):
+        self.trace_id = uuid.uuid4().hex
+        self.document = document
+        self.metrics = metrics
+        self.started = time.time() if started is None else started
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, start=None, **attrs):
+        """Add a finished span that took `seconds`, ending now unless its wall-clock `start` is given."""
+        start = time.time() - seconds if start is None else start
+        with self._lock:
+            self.spans.append({"name": name, "start": start, "duration_ms": seconds * 1000, **attrs})
+        if self.metrics is not None:
+            self.metrics.observe(name, seconds, **{k: attrs.get(k) for k in LABELS})
+
+    def extend(self, spans):
+        """Add spans recorded elsewhere, e.g. by a shard worker process, and count them in this trace's metrics."""
+        for span in spans:
+            span = dict(span)
+            name, start, seconds = span.pop("name"), span.pop("start"), span.pop("duration_ms") / 1000
+            self.record(name, seconds, start=start, **span)
+
+    @contextmanager
+    def activate(self):
+        """Make this the trace that span() and record() report to on the calling thread, within the block."""
+        previous, previous_attrs = getattr(_local, "trace", None), getattr(_local, "attrs", {})
+        _local.trace, _local.attrs = self, {}
+        try:
+            yield self
+        finally:
+            _local.trace, _local.attrs = previous, previous_attrs
+
+    def bind(self, fn):
+        """Wrap `fn` to run with this trace activated, e.g. a pipeline stage that runs on another thread."""
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.activate():
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    def summary(self):
+        """Count and total milliseconds per span name, most expensive first."""
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                entry = totals.setdefault(span["name"], {"count": 0, "total_ms": 0.0})
+                entry["count"] += 1
+                entry["total_ms"] += span["duration_ms"]
+        return dict(sorted(totals.items(), key=lambda item: -item[1]["total_ms"]))
+
+    def to_dict(self):
+        """The trace as JSON-serializable data, span starts in milliseconds since the trace started."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start"])
+        return {
+            "trace_id": self.trace_id,
+            "document": self.document,
+            "started": self.started,
+            "duration_ms": (time.time() - self.started) * 1000,
+            "summary": self.summary(),
+            "spans": [{**span, "start_ms": (span["start"] - self.started) * 1000} for span in spans],
+        }
+
+
+def current_trace():
+    """The trace activated on the calling thread, or None."""
+    return getattr(_local, "trace", None)
+
+
+def annotate(**attrs):
+    """Add attributes that the following spans on the calling thread inherit, until the enclosing span ends."""
+    _local.attrs = {**getattr(_local, "attrs", {}), **attrs}
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a block as a span of the calling thread's active trace.
+
+    Spans opened inside another span on the same thread inherit its attributes, so an OCR call made while a page's
+    element is extracted is recorded with that page and element type. Without an active trace, e.g. in the layout
+    service, the span is only counted in METRICS.
+
+    Yields:
+        dict: The span's attributes, inherited ones included; attributes only known inside the block can be added.
+    """
+    trace, parent = current_trace(), getattr(_local, "attrs", {})
+    attrs = _local.attrs = {**parent, **attrs}
+    start, t0 = time.time(), time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        _local.attrs = parent
+        seconds = time.perf_counter() - t0
+        if trace is not None:
+            trace.record(name, seconds, start=start, **attrs)
+        else:
+            METRICS.observe(name, seconds, **{k: attrs.get(k) for k in LABELS})
+
+
+def record(name, seconds, **attrs):
+    """Add a span that was timed elsewhere, e.g. by the predictor's profilers, to the active trace or METRICS."""
+    attrs = {**getattr(_local, "attrs", {}), **attrs}
+    trace = current_trace()
+    if trace is not None:
+        trace.record(name, seconds, **attrs)
+    else:
+        METRICS.observe(name, seconds, **{k: attrs.get(k) for k in LABELS})
+
+
+def record_predict_batch(predictor):
+    """
+    on_predict_batch_end callback that records the predictor's preprocess, inference and postprocess time of a batch.
+
+    Register it with model.add_callback("on_predict_batch_end", record_predict_batch).
+    """
+    pages = len(predictor.batch[1])
+    for stage, profiler in zip(("preprocess", "inference", "postprocess"), predictor.profilers):
+        record(f"detect.{stage}", profiler.dt, batch=pages)
+
+
+class TraceLog:
+    """
+    The most recent document traces in memory, and optionally every trace appended to a JSONL file.
+
+    Args:
+        path (str, optional): JSONL file to append finished traces to.
+        keep (int): Number of recent traces kept in memory.
+    """
+
+    def __init__(self, path=None, keep=50):
+        self.path = path
+        self._recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def add(self, trace):
+        data = trace.to_dict()
+        with self._lock:
+            self._recent.append(data)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(data, ensure_ascii=False) + "\n")
+
+    def recent(self, n=None):
+        """The last `n` traces, newest first."""
+        with self._lock:
+            traces = list(self._recent)[::-1]
+        return traces[:n] if n else traces
+
+
+def serve_metrics(trace_log=None, host="127.0.0.1", port=7861, metrics=METRICS):
+    """
+    Serve the span histograms and recent traces over HTTP from a daemon thread.
+
+    Endpoints: `/metrics` in the Prometheus text format, `/metrics.json` with the snapshot() histograms as "spans" and
+    the counters() as "counters", and `/traces?n=10` with the most recent document traces of `trace_log`.
+
+    Returns:
+        ThreadingHTTPServer: The running server, shut it down with shutdown().
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/metrics":
+                body, content_type = metrics.prometheus(), "text/plain; version=0.0.4"
+            elif url.path == "/metrics.json":
+                body = json.dumps({"spans": metrics.snapshot(), "counters": metrics.counters()})
+                content_type = "application/json"
+            elif url.path == "/traces" and trace_log is not None:
+                n = int(parse_qs(url.query).get("n", ["10"])[0])
+                body, content_type = json.dumps(trace_log.recent(n)), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):  # scrapes would flood the console
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"DEBUG: Serving pipeline metrics on http://{host}:{port}/metrics")
+    return server
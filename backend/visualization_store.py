@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+from PIL import Image
+
+
+def spill_directory():
+    """Create a temporary directory for spilled visualizations, under GRADIO_TEMP_DIR when set so Gradio serves it."""
+    temp_dir = os.environ.get("GRADIO_TEMP_DIR")
+    if temp_dir:
+        os.makedirs(temp_dir, exist_ok=True)
+    return tempfile.mkdtemp(prefix="vis_", dir=temp_dir)
+
+
+class VisualizationStore:
+    """
+    Keep page visualizations of a document within a memory budget.
+
+    Visualizations are shrunk to `max_side` and kept in memory as long as they fit in the budget. Once the budget is
+    used up, further pages are written to JPEG files in the spill directory and referenced by path, which Gradio
+    galleries accept in place of arrays. Memory reserved for rasters still in flight (see reserve()) counts against
+    the budget until it is released.
+
+    The store is a context manager: on close() it deletes the temporary spill directory it created, so use it for as
+    long as the spilled paths are read, e.g. the lifetime of a streaming pipeline whose consumer copies each result.
+
+    Args:
+        budget_bytes (int): Memory allowed for visualizations and reserved in-flight rasters.
+        max_side (int, optional): Longer side in pixels visualizations are downscaled to.
+        spill_dir (str, optional): Directory for spilled visualizations, owned by the caller and left in place by
+            close(). Defaults to a new temporary directory that close() removes.
+    """
+
+    def __init__(self, budget_bytes, max_side=None, spill_dir=None):
+        self.budget_bytes = budget_bytes
+        self.max_side = max_side
+        self.spill_dir = spill_dir
+        self._own_spill_dir = False
+        self.reserved_bytes = 0
+        self.resident_bytes = 0
+        self.spilled = 0
+        self._lock = threading.Lock()  # rasters are reserved by the rendering thread and released by the consumer
+
+    def reserve(self, nbytes):
+        """Count memory of a raster that is rendered but not yet through text extraction against the budget."""
+        with self._lock:
+            self.reserved_bytes += nbytes
+
+    def release(self, nbytes):
+        """Return memory set aside with reserve() once its raster has been consumed."""
+        with self._lock:
+            self.reserved_bytes = max(self.reserved_bytes - nbytes, 0)
+
+    def add(self, visualization):
+        """
+        Store one page visualization.
+
+        Args:
+            visualization (np.ndarray | str): RGB array, or a path to an image that is already on disk.
+
+        Returns:
+            np.ndarray | str: What to hand to the gallery, an in-memory (thumbnail) array or a file path.
+        """
+        if isinstance(visualization, str):
+            return visualization
+
+        image = Image.fromarray(visualization)
+        if self.max_side and max(image.size) > self.max_side:
+            image.thumbnail((self.max_side, self.max_side))
+            visualization = None  # drop the full-size array
+
+        nbytes = image.width * image.height * 3
+        with self._lock:
+            fits = self.resident_bytes + self.reserved_bytes + nbytes <= self.budget_bytes
+            if fits:
+                self.resident_bytes += nbytes
+        if fits:
+            return visualization if visualization is not None else np.asarray(image)
+
+        if self.spill_dir is None:
+            self.spill_dir, self._own_spill_dir = spill_directory(), True
+            print(f"DEBUG: Memory budget reached, writing visualizations to {self.spill_dir}")
+        self.spilled += 1
+        # Unique names, several stores may spill into the same caller-owned directory
+        fd, path = tempfile.mkstemp(prefix=f"page_{self.spilled:05d}_", suffix=".jpg", dir=self.spill_dir)
+        os.close(fd)
+        image.save(path, quality=85)
+        return path
+
+    def close(self):
+        """Delete the spill directory if the store created it and forget the memory it accounted for."""
+        if self._own_spill_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir, self._own_spill_dir = None, False
+        self.reserved_bytes = self.resident_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()